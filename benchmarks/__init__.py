@@ -0,0 +1,3 @@
+"""
+Performance benchmarks for ethdasm. Run each module with ``python -m``.
+"""
@@ -0,0 +1,92 @@
+"""
+Bytecode corpora for the benchmarks: synthetic contracts with controllable
+shape, and the small runtime bytecodes vendored in ``benchmarks/contracts``
+and ``examples``. The vendored ones are the EIP-1167 minimal proxy and the
+example contract, so they say nothing about real dispatchers or large
+contracts; the synthetic shapes stand in for those until deployed
+bytecodes are added to ``benchmarks/contracts``.
+"""
+import glob
+import os
+import random
+from typing import Dict
+
+from benchmarks.dispatch import HEADER
+from ethdasm.source import read_code
+
+CONTRACTS = os.path.join(os.path.dirname(__file__), 'contracts')
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'examples')
+
+# Straight-line fragments for function bodies.
+BODY_FRAGMENTS = [
+    '6001600201',       # PUSH1 01 PUSH1 02 ADD
+    '600052',           # PUSH1 00 MSTORE
+    '33',               # CALLER
+    '60003550',         # PUSH1 00 CALLDATALOAD POP
+    '6020516001',       # PUSH1 20 MLOAD PUSH1 01
+    '01',               # ADD
+    '16',               # AND
+    '600055',           # PUSH1 00 SSTORE
+    '3450',             # CALLVALUE POP
+]
+
+
+def generate(size: int, width: int=16, dup_swap: float=0.1, push32: float=0.02, seed: int=0) -> bytes:
+    """
+    Builds bytecode of about ``size`` bytes: a dispatcher of DUP1 PUSH4
+    selector EQ PUSH2 dest JUMPI entries for ``width`` functions, followed
+    by their bodies. ``dup_swap`` and ``push32`` are the shares of body
+    fragments that are a DUP or SWAP and a PUSH32 of random data.
+    """
+    rnd = random.Random(seed)
+    dispatcher_size = len(HEADER) // 2 + width * 11 + 4
+    body_size = max((size - dispatcher_size) // max(width, 1), 2)
+    bodies = []
+    for _ in range(width):
+        body = '5b'
+        while len(body) < (body_size - 1) * 2:
+            choice = rnd.random()
+            if choice < dup_swap:
+                body += '{:02x}'.format(rnd.choice([0x80, 0x90]) + rnd.randrange(4))
+            elif choice < dup_swap + push32:
+                body += '7f' + '{:064x}'.format(rnd.getrandbits(256))
+            else:
+                body += rnd.choice(BODY_FRAGMENTS)
+        bodies.append(body + '00')
+    code = HEADER
+    address = dispatcher_size
+    for i, body in enumerate(bodies):
+        code += '8063{:08x}1461{:04x}57'.format(rnd.getrandbits(32), address & 0xffff)
+        address += len(body) // 2
+    return bytes.fromhex(code + '600080fd' + ''.join(bodies))
+
+
+# Synthetic cases: small and large contracts, a wide dispatcher and bodies
+# dense in stack shuffling or in 32-byte constants.
+SYNTHETIC = {
+    'synthetic-4k': dict(size=4096, width=8),
+    'synthetic-24k': dict(size=24576, width=32),
+    'synthetic-wide': dict(size=24576, width=512),
+    'synthetic-dupswap': dict(size=24576, width=32, dup_swap=0.4),
+    'synthetic-push32': dict(size=24576, width=32, push32=0.3),
+}
+
+
+def load_vendored() -> Dict[str, bytes]:
+    """
+    Loads the vendored runtime bytecodes and the repository's examples.
+    """
+    paths = sorted(glob.glob(os.path.join(CONTRACTS, '*.evm')) + glob.glob(os.path.join(EXAMPLES, '*.evm')))
+    return {os.path.splitext(os.path.basename(path))[0]: bytes(read_code(path)) for path in paths}
+
+
+def corpus(synthetic: bool=True, vendored: bool=True) -> Dict[str, bytes]:
+    """
+    Returns the benchmark bytecodes by name.
+    """
+    codes = {}
+    if synthetic:
+        codes.update((name, generate(**shape)) for name, shape in SYNTHETIC.items())
+    if vendored:
+        codes.update(load_vendored())
+    return codes
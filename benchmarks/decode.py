@@ -0,0 +1,31 @@
+"""
+Measures how Parser.decode scales with the size of the bytecode.
+
+    python -m benchmarks.decode
+"""
+import random
+import time
+
+from ethdasm.parse import Parser
+
+SIZES = [1024, 4096, 16384, 65536, 262144, 1048576]
+
+
+def random_code(size: int, seed: int=0) -> bytes:
+    rnd = random.Random(seed)
+    return bytes(rnd.getrandbits(8) for _ in range(size))
+
+
+def main():
+    print('{0: >10} | {1: >10} | {2: >12}'.format('bytes', 'seconds', 'ns/byte'))
+    for size in SIZES:
+        code = random_code(size)
+        for name, data in (('bin', code), ('hex', code.hex())):
+            start = time.perf_counter()
+            Parser.decode(data)
+            elapsed = time.perf_counter() - start
+            print('{0: >10} | {1: >10.4f} | {2: >12.1f} {3}'.format(size, elapsed, elapsed / size * 1e9, name))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Compares Parser.selectors with a full decompile on contracts with wide
+function dispatchers.
+
+    python -m benchmarks.dispatch
+"""
+import time
+
+from ethdasm.contract import Contract
+from ethdasm.parse import Parser
+
+WIDTHS = [4, 16, 64, 256]
+
+# PUSH1 00 CALLDATALOAD PUSH29 0100..00 SWAP1 DIV PUSH4 ffffffff AND
+HEADER = '6000357c' + '01' + '00' * 28 + '9004' + '63ffffffff' + '16'
+# JUMPDEST CALLER PUSH1 00 SSTORE PUSH1 01 PUSH1 02 ADD POP STOP
+BODY = '5b336000556001600201' + '5000'
+
+
+def dispatcher_code(width: int) -> str:
+    """
+    Builds a contract with a dispatcher entry of the form
+    DUP1 PUSH4 selector EQ PUSH2 dest JUMPI for each of ``width`` functions.
+    """
+    entry_size = 11
+    start = len(HEADER) // 2 + width * entry_size + 4
+    code = HEADER
+    for i in range(width):
+        code += '8063{:08x}1461{:04x}57'.format(0x10000000 + i, start + i * len(BODY) // 2)
+    code += '600080fd'
+    return code + BODY * width
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    print('{0: >6} | {1: >10} | {2: >12} | {3: >12} | {4: >8}'.format(
+        'width', 'bytes', 'selectors s', 'decompile s', 'speedup'))
+    for width in WIDTHS:
+        code = dispatcher_code(width)
+        selectors, fast = timed(Parser.selectors, code)
+        assert len(selectors) == width
+        _, full = timed(lambda: Contract(code).parse())
+        print('{0: >6} | {1: >10} | {2: >12.5f} | {3: >12.5f} | {4: >7.1f}x'.format(
+            width, len(code) // 2, fast, full, full / fast))
+
+
+if __name__ == '__main__':
+    main()
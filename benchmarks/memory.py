@@ -0,0 +1,43 @@
+"""
+Measures the memory held by parsed contracts, per byte of bytecode.
+
+    python -m benchmarks.memory
+"""
+import gc
+import tracemalloc
+
+from benchmarks.optimize import synthetic_code
+from ethdasm.contract import Contract
+from ethdasm.parse import Parser
+
+SIZES = [4096, 65536, 262144]
+
+
+def retained(func, *args) -> int:
+    """
+    Returns the number of bytes still allocated by the result of func.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = func(*args)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    print('{0: >10} | {1: >16} | {2: >16} | {3: >16}'.format(
+        'bytes', 'objects B/byte', 'stream B/byte', 'contract B/byte'))
+    for size in SIZES:
+        code = synthetic_code(size)
+        objects = retained(Parser.decode, code)
+        stream = retained(Parser.parse, code)
+        contract = retained(Contract, code)
+        print('{0: >10} | {1: >16.1f} | {2: >16.1f} | {3: >16.1f}'.format(
+            size, objects / size, stream / size, contract / size))
+
+
+if __name__ == '__main__':
+    main()
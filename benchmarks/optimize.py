@@ -0,0 +1,48 @@
+"""
+Measures how Parser.parse, including the peephole optimizer, scales with
+the number of instructions.
+
+    python -m benchmarks.optimize
+"""
+import random
+import time
+
+from ethdasm.parse import Parser
+
+SIZES = [1024, 4096, 16384, 65536, 262144]
+
+# Fragments that exercise argument folding, math folding and jump arguments.
+FRAGMENTS = [
+    '6001600201',       # PUSH1 01 PUSH1 02 ADD
+    '60206040600302',   # PUSH1 20 PUSH1 40 PUSH1 03 MUL
+    '33',               # CALLER
+    '600052',           # PUSH1 00 MSTORE
+    '80',               # DUP1
+    '90',               # SWAP1
+    '5b',               # JUMPDEST
+    '61001056',         # PUSH2 0010 JUMP
+    '6001610010575b',   # PUSH1 01 PUSH2 0010 JUMPI JUMPDEST
+]
+
+
+def synthetic_code(size: int, seed: int=0) -> bytes:
+    rnd = random.Random(seed)
+    code = '333333'
+    while len(code) < size * 2:
+        code += rnd.choice(FRAGMENTS)
+    return bytes.fromhex(code)
+
+
+def main():
+    print('{0: >10} | {1: >12} | {2: >10} | {3: >12}'.format('bytes', 'instructions', 'seconds', 'us/instr'))
+    for size in SIZES:
+        code = synthetic_code(size)
+        count = len(Parser.decode(code))
+        start = time.perf_counter()
+        Parser.parse(code)
+        elapsed = time.perf_counter() - start
+        print('{0: >10} | {1: >12} | {2: >10.4f} | {3: >12.2f}'.format(size, count, elapsed, elapsed / count * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Times each stage of analysis over the benchmark corpus and reports
+throughput and peak memory, optionally against a saved baseline.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --save baseline.json
+    python -m benchmarks.suite --baseline baseline.json --threshold 0.25
+"""
+import argparse
+import gc
+import io
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+import ethdasm.contract
+from benchmarks.corpus import corpus
+from ethdasm.contract import Contract
+from ethdasm.parse import Parser
+from ethdasm.render import write_decompilation, write_disassembly
+
+
+def stages(code: bytes) -> Dict[str, Callable[[], object]]:
+    """
+    The stages of analysis, each a callable that runs it from scratch.
+    Rendering runs on results prepared outside of the timed call.
+    """
+    blocks = Parser.parse(code)
+    lines = Contract(code).parse()
+    return {
+        'parse': lambda: Parser.parse(code),
+        'contract': lambda: Contract(code),
+        'decompile': lambda: Contract(code).parse(),
+        'render': lambda: (write_disassembly(blocks, io.StringIO()), write_decompilation(lines, io.StringIO())),
+    }
+
+
+def cold(func: Callable[[], object]):
+    # translations are memoized per process, clear them so every run
+    # measures a contract seen for the first time
+    ethdasm.contract._templates.clear()
+    return func()
+
+
+def best_time(func: Callable[[], object], repeat: int, minimum: float=0.02) -> float:
+    """
+    Returns the best time of one call over ``repeat`` samples. Fast calls
+    are looped so each sample takes at least ``minimum`` seconds.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            cold(func)
+        if time.perf_counter() - start >= minimum:
+            break
+        number *= 2
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(number):
+            cold(func)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def peak_memory(func: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = cold(func)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def run(repeat: int=5, synthetic: bool=True, vendored: bool=True) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Measures every stage on every contract of the corpus. Times are the
+    best of ``repeat`` runs.
+    """
+    results = {}
+    for name, code in corpus(synthetic, vendored).items():
+        instructions = len(Parser.decode(code))
+        results[name] = {}
+        for stage, func in stages(code).items():
+            seconds = best_time(func, repeat)
+            results[name][stage] = {
+                'seconds': seconds,
+                'bytes_per_s': len(code) / seconds,
+                'instructions_per_s': instructions / seconds,
+                'peak_bytes': peak_memory(func),
+            }
+    return results
+
+
+def report(results: Dict[str, Dict[str, Dict[str, float]]], baseline: Dict=None, threshold: float=0.25) -> int:
+    """
+    Prints the results, with the change in time against the baseline if
+    given. Returns the number of stages slower than the baseline by more
+    than ``threshold``.
+    """
+    regressions = 0
+    print('{0: <18} | {1: <9} | {2: >10} | {3: >10} | {4: >12} | {5: >9} | {6: >8}'.format(
+        'contract', 'stage', 'seconds', 'MB/s', 'Minstr/s', 'peak KB', 'change'))
+    for name, measured in results.items():
+        for stage, result in measured.items():
+            change = ''
+            previous = (baseline or {}).get(name, {}).get(stage)
+            if previous:
+                ratio = result['seconds'] / previous['seconds'] - 1
+                change = '{:+.1%}'.format(ratio)
+                if ratio > threshold:
+                    regressions += 1
+                    change += ' !'
+            print('{0: <18} | {1: <9} | {2: >10.5f} | {3: >10.3f} | {4: >12.3f} | {5: >9.0f} | {6: >8}'.format(
+                name, stage, result['seconds'], result['bytes_per_s'] / 1e6,
+                result['instructions_per_s'] / 1e6, result['peak_bytes'] / 1024, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5, help='runs of each stage, the best is reported')
+    parser.add_argument('--save', type=str, help='saves the results as a baseline JSON file')
+    parser.add_argument('--baseline', type=str, help='compares against a baseline JSON file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='slowdown against the baseline reported as a regression')
+    parser.add_argument('--no-synthetic', action='store_true', help='skips the synthetic contracts')
+    parser.add_argument('--no-vendored', action='store_true', help='skips the vendored contracts')
+    args = parser.parse_args()
+    results = run(args.repeat, not args.no_synthetic, not args.no_vendored)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    regressions = report(results, baseline, args.threshold)
+    if args.save:
+        with open(args.save, 'w') as save_file:
+            json.dump(results, save_file, indent=2)
+    if regressions:
+        print('{} stages regressed by more than {:.0%}'.format(regressions, args.threshold), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
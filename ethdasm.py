@@ -1,41 +1,99 @@
 import argparse
+import sys
+from functools import partial
+
+from ethdasm.batch import iter_items, run_batch
+from ethdasm.budget import add_budget_arguments, budget_from_args
+from ethdasm.cache import ResultCache
 from ethdasm.contract import Contract
-from ethdasm.parse import Parser
-
-parser = argparse.ArgumentParser()
-parser.add_argument('input', help='input hex file to parse')
-parser.add_argument('--decompile', action='store_true', help='decompiles the contract into a python-like pseudo-code')
-parser.add_argument('--disassemble', action='store_true', help='disassembly contract into simplified op-codes')
-parser.add_argument('--out', type=str, help='outputs to a file; outputs to STDOUT if not specified')
-args = parser.parse_args()
-
-with open(args.input, 'r') as contract:
-    contract_data = contract.read()
-    contract_data = contract_data.replace('0x', '')
-    contract_data = contract_data.lower()
-    if args.decompile:
-        contract = Contract(contract_data)
-        blocks = contract.parse()
-        output = ''
-        for lines in blocks:
-            output += str(lines) + '\n'
-            for line in lines.lines:
-                output += "\t" * lines.indentation_level + '{1}'.format(hex(line.address), str(line)) + '\n'
-            output += '\n'
+from ethdasm.parse import ControlIndex, Parser
+from ethdasm.render import write_decompilation, write_disassembly, write_segments, write_selectors
+from ethdasm.source import read_code
+from ethdasm.stats import Phase, Stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('input', help='input hex or binary file to parse, - for STDIN; '
+                                      'a directory, glob or .jsonl file with --batch')
+    parser.add_argument('--decompile', action='store_true', help='decompiles the contract into a python-like pseudo-code')
+    parser.add_argument('--disassemble', action='store_true', help='disassembly contract into simplified op-codes')
+    parser.add_argument('--selectors', action='store_true', help='lists the function selectors of the dispatcher without decompiling')
+    parser.add_argument('--segments', action='store_true', help='lists the creation, runtime, metadata and data segments of the bytecode')
+    parser.add_argument('--segment', default='runtime', choices=['runtime', 'creation', 'metadata', 'data', 'all'],
+                        help='segment of the bytecode to analyze; the runtime code without metadata by default')
+    parser.add_argument('--at', type=lambda address: int(address, 0),
+                        help='only outputs the block, or with --decompile the function, containing this address')
+    parser.add_argument('--out', type=str, help='outputs to a file; outputs to STDOUT if not specified. '
+                                                'With --batch, a directory for one output file per contract')
+    parser.add_argument('--batch', action='store_true', help='analyzes many contracts in parallel')
+    parser.add_argument('--jsonl', type=str, help='with --batch, writes results as JSON lines to this file')
+    parser.add_argument('--workers', type=int, help='number of worker processes for --batch')
+    parser.add_argument('--chunksize', type=int, default=16, help='contracts sent to a worker at a time for --batch')
+    parser.add_argument('--cache', type=str, help='caches results in this directory, keyed by bytecode hash')
+    parser.add_argument('--cache-size', type=int, default=256, help='maximum size of the cache in megabytes')
+    parser.add_argument('--stats', nargs='?', const='text', choices=['text', 'json'],
+                        help='prints the time and counters of each phase to STDERR')
+    add_budget_arguments(parser)
+    args = parser.parse_args()
+    cache_size = args.cache_size * 1024 * 1024
+    stats = Stats() if args.stats else None
+    budget = budget_from_args(args)
+
+    if args.batch:
+        sink = open(args.jsonl, 'w') if args.jsonl else None
+        try:
+            summary = run_batch(iter_items(args.input), decompile=args.decompile, workers=args.workers,
+                                chunksize=args.chunksize, out_dir=args.out, sink=sink,
+                                cache_dir=args.cache, cache_size=cache_size, selectors=args.selectors,
+                                stats=stats, segment=args.segment, budget=budget)
+        finally:
+            if sink is not None:
+                sink.close()
+        print(summary, file=sys.stderr)
+        print_stats(stats, args.stats)
+        return
+
+    cache = ResultCache(args.cache, cache_size) if args.cache else None
+    contract_data = read_code(args.input)
+    with Phase(stats, 'segment'):
+        segment = Parser.segment(contract_data, args.segment)
+    if args.segments:
+        result = Parser.segments(contract_data)
+        write = write_segments
+    elif args.selectors:
+        result = Parser.selectors(segment)
+        write = write_selectors
+    elif args.decompile:
+        contract = Contract(segment, cache, stats, budget)
+        if args.at is None:
+            result = contract.parse()
+        else:
+            function = contract.function(address=args.at)
+            result = [function] if function is not None else []
+        write = partial(write_decompilation, degradations=budget.degradations if budget is not None else ())
     else:
-        blocks = Parser.parse(contract_data)
-        output = ""
-        for block in blocks:
-            output += '\n'
-            output += '; Procedure ' + hex(block.address) + '\n'
-            for operation in block.instructions:
-                output += '[{0: >8}] | {1: <20} | {2}'.format(
-                    hex(operation.address),
-                    operation.instruction.name,
-                    operation.arguments) + '\n'
+        result = Parser.parse(segment, cache, stats, budget)
+        if args.at is not None:
+            index = ControlIndex(result).block_of(args.at)
+            result = [result[index]] if index is not None else []
+        write = partial(write_disassembly, degradations=budget.degradations if budget is not None else ())
     if args.out:
         with open(args.out, 'w') as output_file:
-            output_file.write(output)
+            write(result, output_file)
     else:
-        print(output)
-    
+        write(result, sys.stdout)
+        sys.stdout.write('\n')
+    if cache is not None:
+        print(cache.stats(), file=sys.stderr)
+    print_stats(stats, args.stats)
+
+
+def print_stats(stats, output_format):
+    if stats is None:
+        return
+    print(stats.to_json() if output_format == 'json' else stats, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
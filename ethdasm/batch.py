@@ -0,0 +1,220 @@
+"""
+Analyzes many contracts in parallel on a process pool.
+"""
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import IO, Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from ethdasm.budget import Budget
+from ethdasm.cache import ResultCache
+from ethdasm.contract import Contract
+from ethdasm.parse import Parser
+from ethdasm.render import render_decompilation, render_disassembly, render_selectors
+from ethdasm.source import read_code
+from ethdasm.stats import Phase, Stats
+
+
+class BatchItem(NamedTuple):
+    """
+    A single contract to analyze. Either ``path`` points to a hex or binary
+    file or ``code`` holds the hex bytecode itself. ``error`` is set instead
+    for an entry of the source that could not be read.
+    """
+    name: str
+    path: Optional[str]
+    code: Optional[str]
+    error: Optional[str] = None
+
+
+class BatchResult(NamedTuple):
+    name: str
+    output: Optional[str]
+    error: Optional[str]
+    size: int
+    cached: bool = False
+    stats: Optional[Dict[str, Dict[str, Any]]] = None
+    degraded: Optional[List[str]] = None
+
+
+class BatchSummary(NamedTuple):
+    contracts: int
+    errors: int
+    size: int
+    seconds: float
+    cache_hits: int = 0
+    degraded: int = 0
+
+    def __str__(self):
+        rate = self.contracts / self.seconds if self.seconds else 0.0
+        throughput = self.size / self.seconds if self.seconds else 0.0
+        return '{} contracts ({} errors, {} cached, {} degraded), {} bytes in {:.2f}s: ' \
+               '{:.1f} contracts/s, {:.0f} bytes/s'.format(self.contracts, self.errors, self.cache_hits, self.degraded,
+                                                          self.size, self.seconds, rate, throughput)
+
+
+_caches: Dict[Tuple[str, int], ResultCache] = {}
+
+
+def get_cache(directory: str, max_bytes: int) -> ResultCache:
+    """
+    Returns the cache for a directory, shared by all items a worker process
+    analyzes.
+    """
+    cache = _caches.get((directory, max_bytes))
+    if cache is None:
+        cache = _caches[(directory, max_bytes)] = ResultCache(directory, max_bytes)
+    return cache
+
+
+def normalize_code(code: str) -> str:
+    """
+    Strips whitespace and a leading 0x from hex bytecode.
+    """
+    code = code.strip()
+    if code[:2] in ('0x', '0X'):
+        code = code[2:]
+    return code
+
+
+def output_name(name: str, taken: Set[str]) -> str:
+    """
+    Returns the relative path below an output directory for a result
+    name, adding it to ``taken``. Absolute paths lose their root and
+    ``..`` components are dropped, so every output stays in the directory,
+    and a name that was taken already gets a ``-2``, ``-3``, ... suffix.
+    """
+    parts = os.path.normpath(os.path.splitdrive(name)[1]).replace('\\', '/').split('/')
+    parts = [part for part in parts if part not in ('', '.', '..')] or ['_']
+    base = os.path.join(*parts)
+    path, number = base, 1
+    while path in taken:
+        number += 1
+        path = '{}-{}'.format(base, number)
+    taken.add(path)
+    return path
+
+
+def iter_items(source: str) -> Iterator[BatchItem]:
+    """
+    Lists the contracts in a directory, a glob pattern or a JSON-lines file
+    of ``{"address": ..., "bytecode": ...}`` records. Files are named by
+    their path below the directory all of them are in, so files of the same
+    name in different directories stay apart. A malformed record becomes
+    an item with an error, named by the file and line number.
+    """
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(source, name) for name in os.listdir(source))
+        paths = [path for path in paths if os.path.isfile(path)]
+    elif os.path.isfile(source) and source.endswith('.jsonl'):
+        with open(source, 'r') as records:
+            for number, line in enumerate(records, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    item = BatchItem(str(record['address']), None, str(record['bytecode']))
+                except (ValueError, TypeError, KeyError) as e:
+                    item = BatchItem('{}:{}'.format(os.path.basename(source), number), None, None,
+                                     'malformed record: {}: {}'.format(type(e).__name__, e))
+                yield item
+        return
+    else:
+        paths = sorted(glob.glob(source))
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths]) if paths else ''
+    for path in paths:
+        yield BatchItem(os.path.relpath(os.path.abspath(path), root), path, None)
+
+
+def read_item(item: BatchItem) -> memoryview:
+    """
+    Reads the bytecode of an item, raising ValueError for an item that
+    holds an error.
+    """
+    if item.error is not None:
+        raise ValueError(item.error)
+    if item.code is None:
+        return read_code(item.path)
+    return Parser.to_bytes(normalize_code(item.code))
+
+
+def analyze(item: BatchItem, decompile: bool=False, cache_dir: Optional[str]=None,
+            cache_size: int=256 * 1024 * 1024, selectors: bool=False, stats: bool=False,
+            segment: str='runtime', budget: Optional[Budget]=None) -> BatchResult:
+    """
+    Disassembles or decompiles one segment of a contract. Errors are returned
+    in the result instead of raised so one bad contract does not stop a batch.
+    Each contract gets the limits of ``budget`` with a clock of its own;
+    what was disassembled to stay within them is listed in the output and
+    the result.
+    """
+    code = b''
+    phases = Stats() if stats else None
+    budget = budget.renewed() if budget is not None else None
+    degradations = budget.degradations if budget is not None else []
+    try:
+        code = read_item(item)
+        with Phase(phases, 'segment'):
+            analyzed = Parser.segment(code, segment)
+        cache = get_cache(cache_dir, cache_size) if cache_dir is not None else None
+        hits = cache.hits if cache is not None else 0
+        if selectors:
+            output = render_selectors(Parser.selectors(analyzed))
+        elif decompile:
+            output = render_decompilation(Contract(analyzed, cache, phases, budget).parse(), degradations)
+        else:
+            output = render_disassembly(Parser.parse(analyzed, cache, phases, budget), degradations)
+        cached = cache is not None and cache.hits > hits
+        return BatchResult(item.name, output, None, len(code), cached, phases and phases.as_dict(),
+                           [str(degradation) for degradation in degradations] if degradations else None)
+    except Exception as e:
+        return BatchResult(item.name, None, '{}: {}'.format(type(e).__name__, e), len(code),
+                           stats=phases and phases.as_dict())
+
+
+def run_batch(items: Iterator[BatchItem], decompile: bool=False, workers: Optional[int]=None,
+              chunksize: int=16, out_dir: Optional[str]=None, sink: Optional[IO[str]]=None,
+              cache_dir: Optional[str]=None, cache_size: int=256 * 1024 * 1024,
+              selectors: bool=False, stats: Optional[Stats]=None, segment: str='runtime',
+              budget: Optional[Budget]=None) -> BatchSummary:
+    """
+    Analyzes the ``segment`` of each contract on a process pool, writing each
+    result as soon as it is ready. Results go to one file per contract in
+    ``out_dir``, named by ``output_name``, or as JSON lines to ``sink``.
+    Workers share the on-disk cache in ``cache_dir``, and the phase timings
+    of every contract are added to ``stats`` if given. Every contract is held to the limits of ``budget``.
+    """
+    if out_dir is None and sink is None:
+        sink = sys.stdout
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    contracts = errors = size = cache_hits = degraded = 0
+    taken: Set[str] = set()
+    worker = partial(analyze, decompile=decompile, cache_dir=cache_dir, cache_size=cache_size, selectors=selectors,
+                     stats=stats is not None, segment=segment, budget=budget)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(worker, items, chunksize=chunksize):
+            contracts += 1
+            size += result.size
+            cache_hits += result.cached
+            if stats is not None and result.stats is not None:
+                stats.merge(result.stats)
+            if result.error is not None:
+                errors += 1
+            if result.degraded:
+                degraded += 1
+            if out_dir is not None:
+                extension = '.error' if result.error is not None else '.dasm'
+                path = os.path.join(out_dir, output_name(result.name, taken) + extension)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w') as output_file:
+                    output_file.write(result.error if result.error is not None else result.output)
+            else:
+                sink.write(json.dumps({'address': result.name, 'output': result.output, 'error': result.error,
+                                       'degraded': result.degraded}) + '\n')
+    return BatchSummary(contracts, errors, size, time.perf_counter() - start, cache_hits, degraded)
@@ -0,0 +1,98 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from ethdasm.batch import BatchItem, analyze, iter_items, output_name, run_batch
+
+
+class TestBatch(unittest.TestCase):
+    def test_iter_jsonl(self):
+        """
+        Tests reading contracts from a JSON-lines file.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'contracts.jsonl')
+            with open(path, 'w') as records:
+                records.write(json.dumps({'address': '0x1', 'bytecode': '0x6002600201'}) + '\n')
+                records.write(json.dumps({'address': '0x2', 'bytecode': '5b'}) + '\n')
+            items = list(iter_items(path))
+        self.assertEqual([item.name for item in items], ['0x1', '0x2'])
+        self.assertEqual(items[0].code, '0x6002600201')
+
+    def test_malformed_records(self):
+        """
+        Tests that malformed JSON lines become error items in place.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'contracts.jsonl')
+            with open(path, 'w') as records:
+                records.write('{"address": "0x1", "bytecode": "00"}\nnot json\n{"bytecode": "00"}\n')
+            items = list(iter_items(path))
+        self.assertEqual([item.name for item in items], ['0x1', 'contracts.jsonl:2', 'contracts.jsonl:3'])
+        self.assertIsNone(items[0].error)
+        result = analyze(items[1])
+        self.assertIsNone(result.output)
+        self.assertIn('malformed record', result.error)
+        self.assertIn('KeyError', items[2].error)
+
+    def test_same_file_names(self):
+        """
+        Tests that files of the same name in different directories get
+        output files of their own.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            for name, code in (('a', '6001'), ('b', '6002')):
+                os.makedirs(os.path.join(directory, name))
+                with open(os.path.join(directory, name, 'c.evm'), 'w') as code_file:
+                    code_file.write(code)
+            items = list(iter_items(os.path.join(directory, '*', 'c.evm')))
+            self.assertEqual([item.name for item in items], [os.path.join('a', 'c.evm'), os.path.join('b', 'c.evm')])
+            out = os.path.join(directory, 'out')
+            run_batch(iter(items), workers=1, out_dir=out)
+            with open(os.path.join(out, 'b', 'c.evm.dasm')) as output_file:
+                self.assertIn('[2]', output_file.read())
+
+    def test_unsafe_names(self):
+        """
+        Tests that JSON-lines addresses cannot write outside the output
+        directory and that repeated addresses do not overwrite each other.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'contracts.jsonl')
+            with open(path, 'w') as records:
+                for address, code in (('../../escape', '6001'), ('/abs', '6002'), ('x', '6003'), ('x', '6004')):
+                    records.write(json.dumps({'address': address, 'bytecode': code}) + '\n')
+            out = os.path.join(directory, 'nested', 'out')
+            run_batch(iter_items(path), workers=1, out_dir=out)
+            self.assertEqual(sorted(os.listdir(out)), ['abs.dasm', 'escape.dasm', 'x-2.dasm', 'x.dasm'])
+            self.assertEqual(sorted(os.listdir(directory)), ['contracts.jsonl', 'nested'])
+            with open(os.path.join(out, 'x-2.dasm')) as output_file:
+                self.assertIn('[4]', output_file.read())
+        self.assertEqual(output_name('a/../../b', set()), 'b')
+        self.assertEqual(output_name('..', set()), '_')
+
+    def test_error_isolation(self):
+        """
+        Tests that a broken contract reports an error instead of raising.
+        """
+        result = analyze(BatchItem('bad', None, '6g'))
+        self.assertIsNone(result.output)
+        self.assertIn('ParseException', result.error)
+
+    def test_run_batch(self):
+        """
+        Tests a small batch streamed to a JSON-lines sink.
+        """
+        items = [BatchItem('a', None, '6002600201'), BatchItem('b', None, 'zz'), BatchItem('c', None, '5b')]
+        sink = io.StringIO()
+        summary = run_batch(iter(items), decompile=True, workers=1, sink=sink)
+        results = [json.loads(line) for line in sink.getvalue().splitlines()]
+        self.assertEqual([r['address'] for r in results], ['a', 'b', 'c'])
+        self.assertEqual(summary.contracts, 3)
+        self.assertEqual(summary.errors, 1)
+        self.assertIn('def main', results[0]['output'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Limits the work spent on one contract, so junk or adversarial bytecode
+cannot stall a worker. Work over a limit falls back to plain disassembly
+and is recorded as a degradation instead of failing.
+"""
+import argparse
+import time
+from typing import List, NamedTuple, Optional
+
+
+class Degradation(NamedTuple):
+    """
+    Work left undone: ``address`` is the block it concerns, or None for
+    the whole contract.
+    """
+    address: Optional[int]
+    reason: str
+
+    def __str__(self):
+        if self.address is None:
+            return self.reason
+        return '{}: {}'.format(hex(self.address), self.reason)
+
+
+class Budget:
+    """
+    The limits of one contract: the number of instructions it may have to
+    be optimized and decompiled, the number of instructions of a block that
+    is still decompiled and the wall-clock seconds from the budget's
+    creation. Any limit can be None. Degradations are added to
+    ``degradations`` as they happen.
+    """
+
+    def __init__(self, max_instructions: Optional[int]=None, max_block: Optional[int]=None,
+                 seconds: Optional[float]=None):
+        self.max_instructions = max_instructions
+        self.max_block = max_block
+        self.seconds = seconds
+        self.deadline = time.perf_counter() + seconds if seconds is not None else None
+        self.degradations: List[Degradation] = []
+
+    def renewed(self) -> 'Budget':
+        """
+        Returns a budget with the same limits whose clock starts now, for
+        the next contract.
+        """
+        return Budget(self.max_instructions, self.max_block, self.seconds)
+
+    @property
+    def degraded(self) -> bool:
+        return bool(self.degradations)
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def allows_instructions(self, count: int) -> bool:
+        return self.max_instructions is None or count <= self.max_instructions
+
+    def allows_block(self, count: int) -> bool:
+        return self.max_block is None or count <= self.max_block
+
+    def degrade(self, address: Optional[int], reason: str):
+        self.degradations.append(Degradation(address, reason))
+
+
+def add_budget_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--max-instructions', type=int,
+                        help='disassembles contracts of more instructions without optimizing or decompiling them')
+    parser.add_argument('--max-block', type=int, help='disassembles blocks of more instructions instead of decompiling')
+    parser.add_argument('--deadline', type=float,
+                        help='seconds per contract, after which the remaining work falls back to disassembly')
+
+
+def budget_from_args(args: argparse.Namespace) -> Optional[Budget]:
+    """
+    Returns the budget set on the command line, or None without limits.
+    """
+    if args.max_instructions is None and args.max_block is None and args.deadline is None:
+        return None
+    return Budget(args.max_instructions, args.max_block, args.deadline)
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+
+from ethdasm.batch import BatchItem, analyze
+from ethdasm.budget import Budget
+from ethdasm.cache import ResultCache
+from ethdasm.contract import Contract, DisassembledBlock
+from ethdasm.parse import Parser
+from ethdasm.render import render_decompilation
+from ethdasm.serialize import dumps, loads
+
+# PUSH1 02 PUSH1 03 JUMPDEST PUSH1 02 ADD CALLER DUP1 SWAP1 POP JUMPDEST PUSH1 04 MUL
+CODE = '600260035b600201338090505b600402'
+
+
+class TestBudget(unittest.TestCase):
+    def test_max_block(self):
+        """
+        Tests that only the block over the limit is disassembled, and that
+        the blocks around it are still decompiled.
+        """
+        budget = Budget(max_block=4)
+        lines = Contract(CODE, budget=budget).parse()
+        self.assertIsInstance(lines[1], DisassembledBlock)
+        self.assertEqual([str(line) for line in lines[1].lines],
+                         ['JUMPDEST', 'PUSH1 0x2', 'ADD', 'CALLER', 'DUP1', 'SWAP1', 'POP'])
+        self.assertEqual(str(lines[0].lines[-1]), 'func1()')
+        self.assertEqual([str(line) for line in lines[2].lines], ['var3 = 0x4 * arg0'])
+        self.assertEqual([(d.address, d.reason) for d in budget.degradations],
+                         [(4, 'block of 7 instructions, over the limit of 4: not decompiled')])
+        self.assertIn('# degraded: 0x4: block of 7', render_decompilation(lines, budget.degradations))
+
+    def test_max_instructions(self):
+        """
+        Tests that a contract over the limit is neither optimized nor
+        decompiled.
+        """
+        budget = Budget(max_instructions=5)
+        contract = Contract(CODE, budget=budget)
+        self.assertEqual(contract.blocks[0].instructions[1].instruction.name, 'PUSH1')
+        lines = contract.parse()
+        self.assertTrue(all(isinstance(block, DisassembledBlock) for block in lines))
+        self.assertEqual([d.reason for d in budget.degradations],
+                         ['12 instructions, over the limit of 5: not optimized',
+                          '12 instructions, over the limit of 5: not decompiled'])
+
+    def test_deadline(self):
+        """
+        Tests that once the deadline has passed, the rest is disassembled
+        and the degradation is recorded once.
+        """
+        budget = Budget(seconds=0)
+        lines = Contract(CODE, budget=budget).parse()
+        self.assertTrue(all(isinstance(block, DisassembledBlock) for block in lines))
+        self.assertEqual([str(d) for d in budget.degradations],
+                         ['deadline of 0s passed: not optimized',
+                          '0x0: deadline of 0s passed: this and later blocks not decompiled'])
+        self.assertFalse(budget.renewed().degraded)
+
+    def test_degraded_results(self):
+        """
+        Tests that degraded results are reported by batch analysis, survive
+        serialization and are not cached.
+        """
+        result = analyze(BatchItem('a', None, CODE), decompile=True, budget=Budget(max_block=4))
+        self.assertEqual(result.degraded, ['0x4: block of 7 instructions, over the limit of 4: not decompiled'])
+        self.assertIn('\tPUSH1 0x2\n', result.output)
+        lines = Contract(CODE, budget=Budget(max_block=4)).parse()
+        self.assertEqual(render_decompilation(loads(dumps(lines=lines)).lines), render_decompilation(lines))
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(directory)
+            Contract(CODE, cache, budget=Budget(max_instructions=5)).parse()
+            self.assertEqual(sum(len(names) for _, _, names in os.walk(directory)), 0)
+            Parser.parse(CODE, cache, budget=Budget(max_block=4))
+            self.assertEqual(sum(len(names) for _, _, names in os.walk(directory)), 1)
+
+    def test_exp_folding(self):
+        """
+        Tests that a constant EXP with a huge exponent folds modulo 2**256
+        instead of computing the full power.
+        """
+        blocks = Parser.parse('7f' + 'ff' * 32 + '6003' + '0a')
+        self.assertEqual(blocks[0].instructions[0].arguments, [pow(3, 2 ** 256 - 1, 2 ** 256)])
+
+    def test_zero_divisor(self):
+        """
+        Tests that constant division and modulo by zero fold to 0, as in the
+        EVM, so junk input degrades instead of failing:
+            PUSH1 00
+            PUSH1 05
+            DIV
+        """
+        self.assertEqual(Parser.parse('6000600504')[0].instructions[0].arguments, [0])
+        for code in ('6000600506', '60006005600708', '60006005600709'):
+            self.assertEqual(Parser.parse(code)[0].instructions[0].arguments, [0])
+        result = analyze(BatchItem('x', None, '6000600504'), decompile=True, budget=Budget(seconds=5))
+        self.assertIsNone(result.error)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Content-addressed on-disk cache of parse and decompile results.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, Iterator, NamedTuple, Optional, Tuple
+
+import ethdasm
+from ethdasm.parse import Parser
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+
+    def __str__(self):
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return 'cache: {} hits, {} misses ({:.1f}% hit rate), {} evictions'.format(
+            self.hits, self.misses, rate, self.evictions)
+
+
+# bump whenever parse or decompile output changes, so cached results from
+# before the change are not served
+SCHEMA = 2
+# fraction of max_bytes the cache is evicted down to, so a full cache is
+# not rescanned on every store
+LOW_WATER = 0.9
+
+
+class ResultCache:
+    """
+    Stores pickled results in a directory, keyed by a hash of the bytecode,
+    the kind of result, the ethdasm version and the cache schema. The least recently used
+    entries are evicted once the directory grows past ``max_bytes``, until
+    it is back under ``LOW_WATER`` of it.
+    """
+
+    def __init__(self, directory: str, max_bytes: int=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self.__size = sum(size for _, _, size in self.__entries())
+
+    @staticmethod
+    def key(kind: str, contract_code) -> str:
+        """
+        Hashes hex or binary bytecode, so both spellings of a contract share
+        an entry.
+        """
+        digest = hashlib.sha256('{}:{}:{}:'.format(ethdasm.__version__, SCHEMA, kind).encode())
+        digest.update(Parser.to_bytes(contract_code))
+        return digest.hexdigest()
+
+    def fetch(self, kind: str, contract_code, compute: Callable[[Any], Any],
+              keep: Optional[Callable[[Any], bool]]=None) -> Any:
+        """
+        Returns the cached result for the bytecode, calling ``compute`` with
+        the bytecode and storing its result on a miss, unless ``keep`` is
+        given and returns False for it.
+        """
+        path = self.__path(self.key(kind, contract_code))
+        try:
+            with open(path, 'rb') as entry:
+                value = pickle.load(entry)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+        else:
+            self.hits += 1
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return value
+        self.misses += 1
+        value = compute(contract_code)
+        if keep is None or keep(value):
+            self.__store(path, value)
+        return value
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, self.evictions)
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + '.pickle')
+
+    def __store(self, path: str, value: Any):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(handle, 'wb') as entry:
+            pickle.dump(value, entry, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        self.__size += os.path.getsize(path)
+        if self.__size > self.max_bytes:
+            self.__evict()
+
+    def __entries(self) -> Iterator[Tuple[float, str, int]]:
+        for prefix in os.scandir(self.directory):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name.endswith('.pickle'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, entry.path, stat.st_size
+
+    def __evict(self):
+        """
+        Removes the least recently used entries until the cache is under
+        its low-water mark.
+        """
+        entries = sorted(self.__entries())
+        self.__size = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self.__size <= self.max_bytes * LOW_WATER:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.__size -= size
+            self.evictions += 1
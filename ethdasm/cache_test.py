@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from ethdasm.cache import SCHEMA, ResultCache
+from ethdasm.contract import Contract
+from ethdasm.parse import Parser
+
+
+class TestCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        """
+        Tests that a second parse of the same bytecode is served from the cache,
+        whether it is given as hex or binary.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(directory)
+            first = Parser.parse('6002600201', cache)
+            second = Parser.parse(bytes.fromhex('6002600201'), cache)
+            self.assertEqual(cache.stats().misses, 1)
+            self.assertEqual(cache.stats().hits, 1)
+            self.assertEqual([i.arguments for i in first[0].instructions],
+                             [i.arguments for i in second[0].instructions])
+
+    def test_decompile(self):
+        """
+        Tests that cached decompilation renders the same as a fresh one.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(directory)
+            fresh = Contract('600260035b6002015b600402').parse()
+            Contract('600260035b6002015b600402', cache).parse()
+            cached = Contract('600260035b6002015b600402', cache).parse()
+            self.assertEqual([list(map(str, block.lines)) for block in fresh],
+                             [list(map(str, block.lines)) for block in cached])
+            self.assertEqual(cache.stats().hits, 2)
+
+    def test_schema_key(self):
+        """
+        Tests that results of another cache schema are not served.
+        """
+        key = ResultCache.key('parse', '6001')
+        with mock.patch('ethdasm.cache.SCHEMA', SCHEMA + 1):
+            self.assertNotEqual(ResultCache.key('parse', '6001'), key)
+
+    def test_eviction(self):
+        """
+        Tests that the oldest entries are evicted once the cache is full.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(directory, max_bytes=1)
+            Parser.parse('6001', cache)
+            Parser.parse('6002', cache)
+            self.assertGreaterEqual(cache.stats().evictions, 1)
+            entries = [name for _, _, names in os.walk(directory) for name in names]
+            self.assertLessEqual(len(entries), 1)
+
+    def test_low_water(self):
+        """
+        Tests that eviction frees room below the limit, so the store after
+        an eviction does not evict again.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResultCache(directory, max_bytes=4096)
+            i = 0
+            while not cache.stats().evictions:
+                cache.fetch('test', '60{:02x}'.format(i), lambda code: b'x' * 200)
+                i += 1
+            evictions = cache.stats().evictions
+            self.assertGreater(evictions, 1)
+            cache.fetch('test', '60{:02x}'.format(i), lambda code: b'x' * 200)
+            self.assertEqual(cache.stats().evictions, evictions)
+            size = sum(os.path.getsize(os.path.join(path, name))
+                       for path, _, names in os.walk(directory) for name in names)
+            self.assertLessEqual(size, 4096)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+"""
+Control flow graph of parsed blocks and a worklist dataflow solver over it.
+"""
+import heapq
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+import ethdasm.opcodes as oc
+from ethdasm.parse import Block, ControlIndex, InstructionRange
+
+State = TypeVar('State')
+
+
+def _value(argument) -> int:
+    # arguments are plain ints after parsing and constant Outputs once a
+    # Contract has wrapped them
+    return getattr(argument, 'value', argument)
+
+
+_JUMPS = frozenset(code for code in range(256) if oc.get_opcode_by_code(code).is_jump)
+_PUSHES = frozenset(code for code in range(256) if oc.get_opcode_by_code(code).is_push)
+_TERMINATORS = frozenset(code for code in range(256) if oc.get_opcode_by_code(code).terminates)
+
+
+class ControlFlowGraph:
+    """
+    Edges between parsed blocks, numbered by their position in the list.
+    An edge leaves a block at an instruction: a JUMP or JUMPI with a
+    constant destination, or the end of the block if control falls through
+    into the next one. Nothing leaves a block after a terminator, an
+    instruction tagged ``moves``. Jumps whose destination is only known at
+    runtime are listed in ``dynamic`` as ``(block, instruction)`` pairs,
+    and stay listed when an analysis later adds edges for them.
+    """
+
+    def __init__(self, blocks: List[Block], index: Optional[ControlIndex]=None):
+        self.blocks = blocks
+        self.index = index if index is not None else ControlIndex(blocks)
+        self.successors = [[] for _ in blocks]
+        self.predecessors = [[] for _ in blocks]
+        self.dynamic = set()
+        self.__edges = set()
+        self.__operations = [None] * len(blocks)
+        for number, block in enumerate(blocks):
+            instructions = block.instructions
+            if isinstance(instructions, InstructionRange):
+                stream = instructions.stream
+                codes = stream.opcodes[instructions.start:instructions.stop]
+                def arguments(at, stream=stream, start=instructions.start):
+                    return stream.get_arguments(start + at)
+            else:
+                codes = [operation.instruction.code for operation in instructions]
+                def arguments(at, instructions=instructions):
+                    return instructions[at].arguments
+            self.__link(number, codes, arguments)
+
+    def __link(self, number: int, codes: Sequence[int], arguments: Callable[[int], Optional[list]]):
+        """
+        Adds the edges out of a block from its opcodes, looking up the
+        arguments of jumps and of the pushes before them only.
+        """
+        for at, code in enumerate(codes):
+            if code in _JUMPS:
+                destination = arguments(at)
+                if not destination and at > 0 and codes[at - 1] in _PUSHES:
+                    destination = arguments(at - 1)
+                if destination:
+                    self.add_edge(number, _value(destination[0]), at)
+                else:
+                    self.dynamic.add((number, at))
+            if code in _TERMINATORS:
+                return
+        if number + 1 < len(self.blocks):
+            self.__add(number, number + 1, len(codes))
+
+    def operations(self, number: int) -> List[Tuple[oc.OpCode, Optional[Tuple[int, ...]]]]:
+        """
+        Lists the opcode and constant arguments of each instruction of a
+        block, for analyses to run over.
+        """
+        operations = self.__operations[number]
+        if operations is None:
+            operations = self.__operations[number] = [
+                (operation.instruction, tuple(map(_value, operation.arguments)) if operation.arguments else None)
+                for operation in self.blocks[number].instructions]
+        return operations
+
+    def add_edge(self, number: int, destination: int, at: int) -> Optional[int]:
+        """
+        Adds an edge from the jump at instruction ``at`` of a block to the
+        block at the destination address. Returns the number of the block
+        reached, or None if the destination is not a JUMPDEST.
+        """
+        if not self.index.is_jumpdest(destination):
+            return None
+        target = self.index.block_at(destination)
+        self.__add(number, target, at)
+        return target
+
+    def __add(self, number: int, target: int, at: int):
+        if (number, target, at) not in self.__edges:
+            self.__edges.add((number, target, at))
+            self.successors[number].append((target, at))
+            self.predecessors[target].append((number, at))
+
+    def fallthrough(self, number: int) -> Optional[int]:
+        """
+        Returns the block control falls into from the end of a block,
+        passing over empty blocks.
+        """
+        end = len(self.blocks[number].instructions)
+        for target, at in self.successors[number]:
+            if at == end:
+                return target if len(self.blocks[target].instructions) else self.fallthrough(target)
+        return None
+
+    def reverse_postorder(self, entries: Iterable[int]=(0,)) -> List[int]:
+        """
+        Orders the blocks reachable from the entries so that, loops aside,
+        every block comes after its predecessors.
+        """
+        order = []
+        seen = set()
+        for entry in entries:
+            if entry in seen:
+                continue
+            seen.add(entry)
+            stack = [(entry, iter(self.successors[entry]))]
+            while stack:
+                number, successors = stack[-1]
+                for target, _ in successors:
+                    if target not in seen:
+                        seen.add(target)
+                        stack.append((target, iter(self.successors[target])))
+                        break
+                else:
+                    stack.pop()
+                    order.append(number)
+        order.reverse()
+        return order
+
+
+def solve(cfg: ControlFlowGraph, transfer: Callable[[int, State], Iterable[Tuple[int, State]]],
+          join: Callable[[State, State], State], entry: State, entries: Iterable[int]=(0,)) -> Dict[int, State]:
+    """
+    Solves a forward dataflow problem and returns the state at the start of
+    every block reached. ``transfer`` takes a block and its state and yields
+    the state passed along each edge out of it; it may add edges to the
+    graph as it learns about them. The states of a block's predecessors are
+    combined with ``join``, which must only ever lose information so the
+    solver ends. Blocks are visited in reverse postorder from a worklist, so
+    each one is revisited only when the state reaching it changes.
+    """
+    entries = list(entries)
+    rank = {number: position for position, number in enumerate(cfg.reverse_postorder(entries))}
+    states = {}
+    worklist = []
+    queued = set()
+    def schedule(number):
+        if number not in queued:
+            queued.add(number)
+            heapq.heappush(worklist, (rank.setdefault(number, len(rank)), number))
+    for number in entries:
+        states[number] = entry
+        schedule(number)
+    while worklist:
+        _, number = heapq.heappop(worklist)
+        queued.discard(number)
+        for target, state in transfer(number, states[number]):
+            if target not in states:
+                states[target] = state
+            else:
+                state = join(states[target], state)
+                if state == states[target]:
+                    continue
+                states[target] = state
+            schedule(target)
+    return states
+
+
+def stack_heights(cfg: ControlFlowGraph, entries: Iterable[int]=(0,)) -> Dict[int, Optional[int]]:
+    """
+    Infers the height of the stack at the start of every block reached,
+    counting from the entries. Blocks reached with different heights get
+    None, as does everything reached from them.
+    """
+    # heights relative to the start of each block, after each instruction
+    offsets = []
+    for number in range(len(cfg.blocks)):
+        heights = [0]
+        operations = cfg.operations(number)
+        for opcode, arguments in operations:
+            heights.append(heights[-1] + opcode.added - (0 if arguments else opcode.removed))
+        offsets.append(heights)
+    def transfer(number, height):
+        end = len(cfg.blocks[number].instructions)
+        for target, at in cfg.successors[number]:
+            # a jump leaves after popping its destination
+            yield target, None if height is None else height + offsets[number][at + 1 if at < end else end]
+    def join(first, second):
+        return first if first == second else None
+    return solve(cfg, transfer, join, 0, entries)
+
+
+def propagate_constants(cfg: ControlFlowGraph, entries: Iterable[int]=(0,),
+                        depth: int=16) -> Dict[int, Tuple[Optional[int], ...]]:
+    """
+    Follows constants across blocks and returns the top ``depth`` values
+    of the stack at the start of every block reached, top last, with None
+    for values that are not constant. Constant math is folded along the
+    way. Dynamic jumps whose destination turns out to be constant, such as
+    returns from internal functions, are added to the graph as edges.
+    """
+    def transfer(number, state):
+        stack = list(state)
+        def pop():
+            return stack.pop() if stack else None
+        operations = cfg.operations(number)
+        exits = {}
+        for target, at in cfg.successors[number]:
+            exits.setdefault(at, []).append(target)
+        for at, (opcode, arguments) in enumerate(operations):
+            if opcode.is_dup:
+                stack.append(stack[-opcode.removed] if len(stack) >= opcode.removed else None)
+                continue
+            if opcode.is_swap:
+                if len(stack) >= opcode.removed:
+                    stack[-1], stack[-opcode.removed] = stack[-opcode.removed], stack[-1]
+                elif stack:
+                    stack[-1] = None
+                continue
+            values = list(arguments) if arguments else [pop() for _ in range(opcode.removed)]
+            if opcode.is_jump:
+                if (number, at) in cfg.dynamic and values[0] is not None:
+                    target = cfg.add_edge(number, values[0], at)
+                    if target is not None:
+                        exits.setdefault(at, []).append(target)
+                for target in exits.pop(at, []):
+                    yield target, tuple(stack[-depth:])
+            if opcode.terminates:
+                return
+            if opcode.is_push:
+                stack.append(values[0])
+            elif opcode.added:
+                result = None
+                if opcode.equivalent_function and None not in values:
+                    result = opcode.equivalent_function(*values) & (2 ** 256 - 1)
+                stack.extend([None] * (opcode.added - 1) + [result])
+        for target in exits.pop(len(operations), []):
+            yield target, tuple(stack[-depth:])
+    def join(first, second):
+        length = min(len(first), len(second))
+        first, second = first[len(first) - length:], second[len(second) - length:]
+        return tuple(a if a == b else None for a, b in zip(first, second))
+    return solve(cfg, transfer, join, (), entries)
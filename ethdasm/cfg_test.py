@@ -0,0 +1,87 @@
+import unittest
+
+from ethdasm.cfg import ControlFlowGraph, propagate_constants, solve, stack_heights
+from ethdasm.parse import Parser
+
+
+# main calls the function at 0x0c, which returns to 0x0a:
+#     0x00 PUSH 0a        0x0a JUMPDEST
+#     0x02 PUSH 01        0x0b STOP
+#     0x04 PUSH 0c        0x0c JUMPDEST
+#     0x06 JUMP           0x0d POP
+#     0x07 JUMPDEST       0x0e JUMP
+#     0x08 CALLER
+#     0x09 STOP
+CALL = '600a6001600c565b33005b005b5056'
+
+
+class TestControlFlowGraph(unittest.TestCase):
+    def test_edges(self):
+        """
+        Tests fallthrough, constant jump and terminator edges:
+            CALLER
+            PUSH 05
+            JUMPI
+            STOP
+            JUMPDEST
+            CALLER
+        """
+        blocks = Parser.parse('33600557005b33')
+        cfg = ControlFlowGraph(blocks)
+        self.assertEqual(sorted(target for target, _ in cfg.successors[0]), [1])
+        self.assertEqual(cfg.successors[1], [])
+        self.assertEqual(cfg.predecessors[1], [(0, 2)])
+        self.assertFalse(cfg.dynamic)
+
+    def test_resolve_return(self):
+        """
+        Tests that the return of an internal function is found by following
+        the constant return address across blocks.
+        """
+        cfg = ControlFlowGraph(Parser.parse(CALL))
+        returning = cfg.index.block_at(0x0c)
+        self.assertEqual(len(cfg.dynamic), 1)
+        self.assertEqual(cfg.successors[returning], [])
+        constants = propagate_constants(cfg)
+        self.assertEqual(constants[returning][-2:], (0x0a, 0x01))
+        self.assertIn(cfg.index.block_at(0x0a), [target for target, _ in cfg.successors[returning]])
+
+    def test_stack_heights(self):
+        """
+        Tests stack heights at the start of each block of the call.
+        """
+        cfg = ControlFlowGraph(Parser.parse(CALL))
+        propagate_constants(cfg)
+        heights = stack_heights(cfg)
+        self.assertEqual(heights[cfg.index.block_at(0x0c)], 2)
+        self.assertEqual(heights[cfg.index.block_at(0x0a)], 0)
+
+    def test_zero_divisor(self):
+        """
+        Tests that a constant division by zero across blocks folds to 0:
+            PUSH 00
+            JUMPDEST
+            PUSH 05
+            DIV
+            JUMPDEST
+        """
+        cfg = ControlFlowGraph(Parser.parse('60005b6005045b'))
+        constants = propagate_constants(cfg)
+        self.assertEqual(constants[cfg.index.block_at(0x02)], (0,))
+        self.assertEqual(constants[cfg.index.block_at(0x06)], (0,))
+
+    def test_solver_visits(self):
+        """
+        Tests that the solver visits each block of a straight line once.
+        """
+        cfg = ControlFlowGraph(Parser.parse('5b33' * 50))
+        visits = []
+        def transfer(number, state):
+            visits.append(number)
+            return [(target, state + 1) for target, _ in cfg.successors[number]]
+        states = solve(cfg, transfer, max, 0)
+        self.assertEqual(sorted(visits), list(range(len(cfg.blocks))))
+        self.assertEqual(states[len(cfg.blocks) - 1], len(cfg.blocks) - 1)
+
+if __name__ == '__main__':
+    unittest.main()
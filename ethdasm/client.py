@@ -0,0 +1,79 @@
+"""
+Sends bytecode to a running ``ethdasm.server`` and prints the result.
+Only the standard library is imported, so the client starts quickly.
+
+    python -m ethdasm.client /tmp/ethdasm.sock examples/contract.evm --decompile
+"""
+import argparse
+import json
+import socket
+import sys
+from typing import Any, Dict, Tuple, Union
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """
+    Reads ``host:port`` or a bare port as a TCP address on the local host,
+    and anything else as the path of a Unix socket.
+    """
+    if address.isdigit():
+        return '127.0.0.1', int(address)
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return host or '127.0.0.1', int(port)
+    return address
+
+
+def connect(address: Union[str, Tuple[str, int]]) -> socket.socket:
+    if isinstance(address, tuple):
+        return socket.create_connection(address)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(address)
+    return sock
+
+
+def request(address: Union[str, Tuple[str, int]], payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Sends one request and waits for its response.
+    """
+    with connect(address) as sock:
+        sock.sendall(json.dumps(payload).encode() + b'\n')
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile('rb') as response:
+            return json.loads(response.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('address', help='path of the server\'s Unix socket, or host:port')
+    parser.add_argument('input', help='file containing bytecode in hex or binary, - for STDIN')
+    parser.add_argument('--decompile', action='store_true', help='decompiles instead of disassembling')
+    parser.add_argument('--selectors', action='store_true', help='lists function selectors and entry points')
+    parser.add_argument('--segment', type=str, default='runtime',
+                        choices=['runtime', 'creation', 'metadata', 'data', 'all'],
+                        help='part of creation bytecode to analyze')
+    args = parser.parse_args()
+    if args.input == '-':
+        data = sys.stdin.buffer.read()
+    else:
+        with open(args.input, 'rb') as input_file:
+            data = input_file.read()
+    try:
+        bytecode = data.decode('ascii').strip()
+        bytes.fromhex(bytecode[2:] if bytecode.startswith('0x') else bytecode)
+    except ValueError:
+        bytecode = data.hex()
+    mode = 'decompile' if args.decompile else 'selectors' if args.selectors else 'disassemble'
+    try:
+        response = request(parse_address(args.address), {'bytecode': bytecode, 'mode': mode, 'segment': args.segment})
+    except OSError as e:
+        print('cannot reach server at {}: {}'.format(args.address, e), file=sys.stderr)
+        sys.exit(1)
+    if response.get('error'):
+        print(response['error'], file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.write(response['output'])
+
+
+if __name__ == '__main__':
+    main()
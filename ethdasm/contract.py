@@ -1,32 +1,93 @@
-from typing import List, Optional, Iterator
+import weakref
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Iterator, Tuple
 
 from ethdasm.opcodes import OpCode, get_opcode_by_mnemonic
-from ethdasm.parse import Parser, Instruction, Block
+from ethdasm.budget import Budget
+from ethdasm.cfg import ControlFlowGraph
+from ethdasm.parse import Parser, Instruction, Block, ControlIndex
+from ethdasm.stats import Phase, Stats
 
 class Output():
     """
     Represents the output of an instruction. Also can be considered
     a single value on the stack. Can be used.
+
+    Constants are interned through Output.constant, so every use of the
+    same value shares one object. Variables and arguments are identified
+    by their number and kind.
     """
+    __slots__ = ('value', 'kind', 'used', '__weakref__')
+
+    CONSTANT = 0
+    VARIABLE = 1
+    ARG = 2
+
     def __init__(self, value: int, variable=False, arg=False):
         self.value = value
-        self.is_variable = variable
-        self.is_arg = arg
+        self.kind = Output.VARIABLE if variable else Output.ARG if arg else Output.CONSTANT
         self.used = False
+    @property
+    def is_variable(self) -> bool:
+        return self.kind == Output.VARIABLE
+    @property
+    def is_arg(self) -> bool:
+        return self.kind == Output.ARG
+    @staticmethod
+    def constant(value: int) -> 'Output':
+        """
+        Returns the shared output for a constant value.
+        """
+        output = _constants.get(value)
+        if output is None:
+            output = _constants[value] = Output(value)
+        return output
     def use(self):
         """
         Use the value on the stack. Once used, this value should not be
         used again.
         """
         self.used = True
+    def __reduce__(self):
+        if self.kind == Output.CONSTANT:
+            return (Output.constant, (self.value,))
+        return (_restore_output, (self.value, self.kind, self.used))
     def __str__(self):
-        if self.is_variable:
+        if self.kind == Output.VARIABLE:
             return 'var' + str(self.value)
-        elif self.is_arg:
+        elif self.kind == Output.ARG:
             return 'arg' + str(self.value)
         else:
             return hex(self.value)
 
+_constants = weakref.WeakValueDictionary()
+
+def _restore_output(value: int, kind: int, used: bool) -> Output:
+    output = Output(value, variable=kind == Output.VARIABLE, arg=kind == Output.ARG)
+    output.used = used
+    return output
+
+class _BlockTemplate(NamedTuple):
+    """
+    The translation of a block with its values replaced by references into
+    the variables the block assigns, then the constants DUP and SWAP copy,
+    and from the end the arguments the block pops. Each line is the opcode,
+    the references of its arguments or None for the instruction's own
+    constants, the range of variables it assigns and where its copied
+    constants go; JUMPDESTs have no line.
+    """
+    args_needed: int
+    variables: int
+    constants: int
+    lines: List[Optional[Tuple[OpCode, Optional[List[int]], int, int, Optional[int]]]]
+    used: List[int]
+    return_vals: List[int]
+
+# templates of translated blocks by fingerprint, shared by every contract
+# analyzed in the process and evicted least recently used first
+_templates = OrderedDict()
+_MAX_TEMPLATES = 1 << 16
+
 class ContractLine():
     """
     Represents one line of code in the contract.
@@ -57,7 +118,7 @@ class InstructionLine(ContractLine):
         l = ""
         if self.assign_to:
             l += ', '.join(map(lambda arg: str(arg), self.assign_to)) + " = "
-        if self.instruction.name.startswith('PUSH'):
+        if self.instruction.is_push:
             l += str(self.args[0])
         elif not self.instruction.infix_operator:
             l += self.instruction.name + '({0})'.format(', '.join(map(str, self.args) or []))
@@ -91,6 +152,25 @@ class JumpLine(ContractLine):
         else:
             return "{}({})".format(self.jump_to, ', '.join(list(map(str, self.args))) if self.args else '')
 
+class DisassemblyLine(ContractLine):
+    """
+    Represents an instruction of a block that was disassembled instead of
+    decompiled.
+    """
+
+    instruction: OpCode
+    args: List[Output]
+
+    def __init__(self, address: int, instruction: OpCode, args: List[Output]):
+        self.instruction = instruction
+        self.args = args
+        super().__init__(address)
+
+    def __str__(self):
+        if not self.args:
+            return self.instruction.name
+        return '{} {}'.format(self.instruction.name, ', '.join(map(str, self.args)))
+
 
 class ContractBlock:
     
@@ -124,8 +204,9 @@ class FunctionHandler:
         self.__function_list = []
     
     def add_func(self, address: int, line: ContractBlock):
+        if address not in self.__function_dict:
+            self.__function_list.append(address)
         self.__function_dict[address] = line
-        self.__function_list.append(address)
     
     def blocks(self) -> Iterator[ContractBlock]:
         for addr in self.__function_list:
@@ -140,6 +221,12 @@ class FunctionHandler:
     def __len__(self):
         return len(self.__function_list)
 
+class DisassembledBlock(ContractBlock):
+    """
+    A block over the budget, kept as its instructions. It takes no
+    arguments and returns nothing, and it is left out of simplification.
+    """
+
 class Contract():
     """
     Represents an entire Ethereum contract. Keeps track of symbols,
@@ -148,88 +235,78 @@ class Contract():
     line_blocks: List[ContractBlock]
     blocks: List[Block]
 
-    def __init__(self, code):
+    def __init__(self, code, cache=None, stats: Optional[Stats]=None, budget: Optional[Budget]=None):
         self.code = code
-        self.blocks = Parser.parse(self.code)
-        for block in self.blocks:
-            for line in block.instructions:
-                line.arguments = list(map(lambda arg: Output(arg), line.arguments or []))
+        self.cache = cache
+        self.stats = stats
+        self.budget = budget
+        self.blocks = Parser.parse(self.code, cache, stats, budget)
+        with Phase(stats, 'wrap_arguments'):
+            for block in self.blocks:
+                for line in block.instructions:
+                    line.arguments = [Output.constant(arg) for arg in line.arguments or []]
+        with Phase(stats, 'index'):
+            self.index = ControlIndex(self.blocks)
         self.symbols = []
         self.line_blocks = []
         self._symbolIdx = 0
         self.functions = FunctionHandler()
+        self.__blocks = {}
+        self.__addresses = {}
+        self.__cfg = None
+        self.__functions = {}
+        self.__selectors = None
+        self.__reused = 0
+        # set once every block left is to be disassembled
+        self.__exhausted = False
+        if budget is not None:
+            count = sum(len(block.instructions) for block in self.blocks)
+            if not budget.allows_instructions(count):
+                budget.degrade(None, '{} instructions, over the limit of {}: not decompiled'.format(
+                    count, budget.max_instructions))
+                self.__exhausted = True
+        previous = None
+        for func_num, block in enumerate(self.blocks):
+            if len(block.instructions) == 0:
+                continue
+            name = 'main' if previous is None else 'func' + str(func_num)
+            self.functions.add_func(block.address, ContractBlock(name))
+            self.__blocks[block.address] = block
+            self.__addresses[name] = block.address
+            previous = block.address
 
-    def get_stack_args(self, block_idx: int, use: bool=True) -> Output:
-        block = self.line_blocks[block_idx].lines
-        for line_num in range(len(block) - 1, -1, -1):
-            line = block[line_num]
-            if 'DUP' in line.instruction.name:
-                i = 0
-                while i < len(line.assign_to):
-                    if not line.assign_to[i].used:
-                        if use: line.assign_to[i].use()
-                        if i == 0:
-                            return line.args[-1]
-                        else:
-                            return line.args[i - 1]
-                    i += 1
-            if 'SWAP' in line.instruction.name:
-                i = 0
-                while i < len(line.assign_to):
-                    if not line.assign_to[i].used:
-                        if use: line.assign_to[i].use()
-                        if i == 0:
-                            return line.args[-1]
-                        elif i == len(line.assign_to) - 1:
-                            return line.args[0]
-                        else:
-                            return line.args[i]
-                    i += 1
-            for var in line.assign_to[::-1]:
-                if not var.used:
-                    if use: var.use()
-                    return var
-        return None
-
-    def __simplify_pushes(self):
-        mapping = {}
-        for block in self.line_blocks:
-            for operation in block.lines:
-                if 'PUSH' in operation.instruction.name:
-                    mapping[operation.assign_to[0]] = operation.args[0]
-        for block in self.line_blocks:
-            for operation in block.lines:
-                for idx, arg in enumerate(operation.args):
-                    if arg in mapping:
-                        operation.args[idx] = mapping[arg]
-            i = 0
-            while i < len(block.lines):
-                operation = block.lines[i]
-                if isinstance(operation, InstructionLine) and 'PUSH' in operation.instruction.name and operation.assign_to[0].used == True:
-                    del block.lines[i]
-                    i -= 1
-                i += 1
-
-    def __simplify_variables(self):
-        mapping = {}
-        var_num = 1
-        for block in self.line_blocks:
-            for operation in block.lines:
-                if isinstance(operation, InstructionLine):
-                    for idx, arg in enumerate(operation.args):
-                        if arg.is_variable:
-                            if arg not in mapping:
-                                raise RuntimeError('Found arg without a mapping.', arg.value)
-                            operation.args[idx] = mapping[arg]
-                    for idx, assignment in enumerate(operation.assign_to):
-                        if assignment.is_variable:
-                            out = Output(var_num, variable=True)
-                            mapping[assignment] = out
-                            operation.assign_to[idx] = out
-                            var_num += 1
-            for idx, return_val in enumerate(block.return_vals):
-                if return_val.is_variable and return_val in mapping:
-                    block.return_vals[idx] = mapping[return_val]
+    @property
+    def cfg(self) -> ControlFlowGraph:
+        """
+        The control flow graph of the contract, built on first use.
+        """
+        if self.__cfg is None:
+            self.__cfg = ControlFlowGraph(self.blocks, self.index)
+        return self.__cfg
+
+    def __following(self, address: int) -> Optional[Block]:
+        """
+        Returns the block control falls into from the end of the block at
+        the address, if any.
+        """
+        following = self.cfg.fallthrough(self.index.block_at(address))
+        return self.blocks[following] if following is not None else None
+
+    @staticmethod
+    def __push_stack(stack: List[Tuple[int, int]], opcode: OpCode, args: List[int], outputs: List[int]):
+        """
+        Pushes the outputs of a line onto the symbolic stack. Each entry is
+        the output slot of the line paired with the value it refers to, so
+        DUP and SWAP outputs resolve directly to the values they copy.
+        """
+        if opcode.is_dup:
+            values = [args[-1]] + args[:len(outputs) - 1]
+            stack.extend(zip(outputs[::-1], values[::-1]))
+        elif opcode.is_swap:
+            values = [args[-1]] + args[1:-1] + [args[0]]
+            stack.extend(zip(outputs[::-1], values[::-1]))
+        else:
+            stack.extend((out, out) for out in outputs)
 
     def __get_func(self, func_hex: Output):
         if func_hex.is_arg or func_hex.is_variable:
@@ -241,89 +318,292 @@ class Contract():
             else:
                 return None
 
-    def __replace_functions(self):
-        for block in self.line_blocks:
-            for idx, operation in enumerate(block.lines):
-                if operation.instruction.name == 'JUMP':
-                    func = self.__get_func(operation.args[0])
-                    block.lines[idx] = JumpLine(operation.address, func)
-                elif operation.instruction.name == 'JUMPI':
-                    func = self.__get_func(operation.args[0])
-                    block.lines[idx] = JumpLine(operation.address, func, operation.args[1])
-    
-    def __add_final_functions(self):
+    def __simplify(self, blocks: List[ContractBlock]):
+        """
+        Simplifies translated blocks in one pass over their lines, rebuilding
+        each block's list of lines as it goes:
+            - DUP and SWAP lines are dropped, their values are already on
+              the stack.
+            - Pushed constants replace the variables they were assigned to,
+              and pushes whose value was used are dropped.
+            - Jumps become JumpLines to the function at their destination.
+            - Remaining variables are renumbered in order of assignment.
         """
-        This should add function calls to the end of functions
+        pushes = {}
+        variables = {}
+        var_num = 1
+        for block in blocks:
+            if isinstance(block, DisassembledBlock):
+                continue
+            lines = []
+            for operation in block.lines:
+                if operation.instruction.is_dup or operation.instruction.is_swap:
+                    continue
+                args = operation.args
+                for idx, arg in enumerate(args):
+                    if arg in pushes:
+                        args[idx] = pushes[arg]
+                if operation.instruction.is_push:
+                    pushes[operation.assign_to[0]] = args[0]
+                    if operation.assign_to[0].used:
+                        continue
+                if operation.instruction.is_jump:
+                    func = self.__get_func(args[0])
+                    if operation.instruction.terminates:
+                        lines.append(JumpLine(operation.address, func))
+                    else:
+                        lines.append(JumpLine(operation.address, func, args[1]))
+                    continue
+                for idx, arg in enumerate(args):
+                    if arg.is_variable:
+                        if arg not in variables:
+                            raise RuntimeError('Found arg without a mapping.', arg.value)
+                        args[idx] = variables[arg]
+                for idx, assignment in enumerate(operation.assign_to):
+                    if assignment.is_variable:
+                        out = Output(var_num, variable=True)
+                        variables[assignment] = out
+                        operation.assign_to[idx] = out
+                        var_num += 1
+                lines.append(operation)
+            block.lines = lines
+            for idx, return_val in enumerate(block.return_vals):
+                if return_val.is_variable and return_val in variables:
+                    block.return_vals[idx] = variables[return_val]
+
+    @staticmethod
+    def __add_final_function(block: ContractBlock, function: Optional[ContractBlock]):
+        """
+        This should add a function call to the end of a function
         without an explicit jump, revert, or throw. The function
-        will point to the next function.
+        will point to the next function. Values the next function needs
+        beyond those returned were below the stack of this function and
+        are passed through as further arguments.
         """
-        for block_idx, block in enumerate(self.functions.blocks()):
-            block: ContractBlock
-            has_end = False
-            for instr in block.lines:
-                if isinstance(instr, InstructionLine) and 'moves' in instr.instruction.tags:
-                    has_end = True
-                if isinstance(instr, JumpLine) and instr.jump_condition is None:
-                    has_end = True
-            if not has_end and block_idx + 1 < len(self.functions):
-                function = self.functions.get_func_at_index(block_idx + 1)
-                arguments = []
-                for i in range(function.args_needed):
+        if isinstance(block, DisassembledBlock):
+            return
+        has_end = False
+        for instr in block.lines:
+            if isinstance(instr, InstructionLine) and instr.instruction.terminates:
+                has_end = True
+            if isinstance(instr, JumpLine) and instr.jump_condition is None:
+                has_end = True
+        if not has_end and function is not None:
+            arguments = []
+            for i in range(function.args_needed):
+                if i < len(block.return_vals):
                     arguments.append(block.return_vals[i])
-                block.lines.append(JumpLine(-1, function.name, args=arguments))
+                else:
+                    arguments.append(Output(block.args_needed, arg=True))
+                    block.args_needed += 1
+            block.lines.append(JumpLine(-1, function.name, args=arguments))
 
-    def parse(self) -> List[List[ContractLine]]:
-        self.line_blocks = []
-        block_idx = 0
-        func_num = 0
-        for block in self.blocks:
-            line = ContractBlock("func" + str(func_num))
-            func_num += 1
-            if len(block.instructions) == 0:
+    def __add_final_functions(self):
+        """
+        Adds the final calls from the last block to the first, so the
+        function a block falls into, which always comes after it, has all
+        its arguments, those it passes through included, before it is
+        called.
+        """
+        for address in reversed(list(self.__blocks)):
+            following = self.__following(address)
+            self.__add_final_function(self.functions.get_func_at_address(address),
+                                      self.functions.get_func_at_address(following.address)
+                                      if following is not None else None)
+
+    @staticmethod
+    def __template(block: Block) -> _BlockTemplate:
+        """
+        Follows the stack of a block with references in place of values.
+        Values missing from the stack become arguments of the block.
+        """
+        args_needed = 0
+        variables = 0
+        constants = 0
+        lines = []
+        used = []
+        stack = []
+        for operation in block.instructions:
+            opcode = operation.instruction
+            if opcode.name == 'JUMPDEST':
+                lines.append(None)
                 continue
-            self.functions.add_func(block.instructions[0].address, line)
-            self.line_blocks.append(line)
-            instr_idx = 0
-            stack_counter = 0 # at the end, this should equal 0
-            for operation in block.instructions:
-                if operation.instruction.name == 'JUMPDEST':
-                    continue
-                in_variables = []
-                out_variables = []
-                stack_counter += operation.instruction.added - operation.instruction.removed
-                if operation.arguments:
-                    in_variables = operation.arguments
+            args = None
+            own = None
+            if operation.arguments:
+                if opcode.is_dup or opcode.is_swap:
+                    # constants copied onto the stack are kept until the end
+                    # of the block, as they can be used or returned later
+                    own = constants
+                    constants += len(operation.arguments)
+                    refs = [(n,) for n in range(own, constants)]
                 else:
-                    for i in range(operation.instruction.removed):
-                        a = self.get_stack_args(block_idx)
-                        if a is None:
-                            a = Output(line.args_needed, arg=True)
-                            line.args_needed += 1
-                        in_variables.append(a)
-                for i in range(operation.instruction.added):
-                    out_variables.append(Output(self._symbolIdx, variable=True))
-                    self._symbolIdx += 1
-                instruction = InstructionLine(address=operation.address, assign_to=out_variables,
-                                           instruction=operation.instruction, args=in_variables)
-                line.add_line(instruction)
-                # self._symbolIdx += 1
-                instr_idx += 1
-            stack_counter += line.args_needed
-            # we need to resolve return values at the end
-            while stack_counter > 0:
-                line.return_vals.append(self.get_stack_args(block_idx, use = False))
-                stack_counter -= 1
-            # for swap op codes, we have to wait until after parsing to remove them
-            idx = 0
-            while idx < len(line.lines):
-                if 'SWAP' in line.lines[idx].instruction.name or 'DUP' in line.lines[idx].instruction.name:
-                    del line.lines[idx]
-                    idx -= 1
-                idx += 1
-            block_idx += 1
-        self.line_blocks[0].name = 'main'
-        self.__simplify_pushes()
-        self.__replace_functions()
-        self.__simplify_variables()
-        self.__add_final_functions()
-        return self.line_blocks
\ No newline at end of file
+                    refs = []
+            else:
+                args = refs = []
+                for _ in range(opcode.removed):
+                    if stack:
+                        slot, value = stack.pop()
+                        used.append(slot)
+                        args.append(value)
+                    else:
+                        args_needed += 1
+                        args.append(-args_needed)
+            outputs = list(range(variables, variables + opcode.added))
+            lines.append([opcode, args, variables, variables + opcode.added, own])
+            variables += opcode.added
+            Contract.__push_stack(stack, opcode, refs, outputs)
+        # constants are stored after the variables
+        def resolve(ref):
+            return variables + ref[0] if isinstance(ref, tuple) else ref
+        for line in lines:
+            if line is None:
+                continue
+            if line[1] is not None:
+                line[1] = [resolve(ref) for ref in line[1]]
+            if line[4] is not None:
+                line[4] += variables
+        # whatever is left on the stack is returned, top of the stack first
+        return_vals = [resolve(value) for _, value in reversed(stack)]
+        return _BlockTemplate(args_needed, variables, constants,
+                              [tuple(line) if line else None for line in lines], used, return_vals)
+
+    def __over_budget(self, block: Block) -> bool:
+        """
+        Returns whether a block is to be disassembled, recording why.
+        """
+        budget = self.budget
+        if budget is None:
+            return False
+        if self.__exhausted:
+            return True
+        if budget.expired():
+            budget.degrade(block.address, 'deadline of {}s passed: this and later blocks not decompiled'.format(
+                budget.seconds))
+            self.__exhausted = True
+            return True
+        if not budget.allows_block(len(block.instructions)):
+            budget.degrade(block.address, 'block of {} instructions, over the limit of {}: not decompiled'.format(
+                len(block.instructions), budget.max_block))
+            return True
+        return False
+
+    def __disassemble(self, block: Block) -> DisassembledBlock:
+        line = DisassembledBlock(self.functions.get_func_at_address(block.address).name)
+        for operation in block.instructions:
+            line.add_line(DisassemblyLine(operation.address, operation.instruction, operation.arguments))
+        return line
+
+    def __translate(self, block: Block) -> ContractBlock:
+        """
+        Translates the instructions of a block into lines of pseudo-code
+        by following the stack of the block. Blocks of the same shape share
+        one template, so only the addresses, constants and variables of
+        this block are filled in. Blocks over the budget are disassembled.
+        """
+        if self.__over_budget(block):
+            return self.__disassemble(block)
+        key = block.fingerprint()
+        template = _templates.get(key)
+        if template is None:
+            template = self.__template(block)
+            if len(_templates) >= _MAX_TEMPLATES:
+                _templates.popitem(last=False)
+            _templates[key] = template
+        else:
+            _templates.move_to_end(key)
+            self.__reused += 1
+        line = ContractBlock(self.functions.get_func_at_address(block.address).name)
+        line.args_needed = template.args_needed
+        outputs = [Output(self._symbolIdx + n, variable=True) for n in range(template.variables)]
+        self._symbolIdx += template.variables
+        # arguments are referenced from the end, -1 being the first
+        values = outputs + [None] * template.constants + \
+            [Output(n, arg=True) for n in reversed(range(template.args_needed))]
+        for spec, operation in zip(template.lines, block.instructions):
+            if spec is None:
+                continue
+            opcode, args, first, last, own = spec
+            if args is None:
+                args = operation.arguments
+                if own is not None:
+                    values[own:own + len(args)] = args
+            else:
+                args = [values[ref] for ref in args]
+            line.add_line(InstructionLine(address=operation.address, assign_to=outputs[first:last],
+                                          instruction=opcode, args=args))
+        for slot in template.used:
+            outputs[slot].use()
+        line.return_vals = [values[ref] for ref in template.return_vals]
+        return line
+
+    def function(self, address: Optional[int]=None, name: Optional[str]=None,
+                 selector: Optional[int]=None) -> Optional[ContractBlock]:
+        """
+        Decompiles a single function, found by the address of any of its
+        instructions, its name or the 4-byte selector that dispatches to it.
+        Only the function and the functions it falls through to are
+        translated, and results are memoized. Variables are numbered from
+        1 within each function.
+        """
+        if selector is not None:
+            if self.__selectors is None:
+                self.__selectors = Parser.selectors(self.code)
+            address = self.__selectors.get(selector)
+        elif name is not None:
+            address = self.__addresses.get(name)
+        elif address is not None and address not in self.__blocks:
+            index = self.index.block_of(address)
+            address = self.blocks[index].address if index is not None else None
+        if address not in self.__blocks:
+            return None
+        # the functions falling into each other up to one already decompiled
+        # are built from the last, as each needs the arguments of the next
+        chain = []
+        while address is not None and address not in self.__functions:
+            chain.append(address)
+            following = self.__following(address)
+            address = following.address if following is not None else None
+        for address in reversed(chain):
+            line = self.__translate(self.__blocks[address])
+            self.__simplify([line])
+            following = self.__following(address)
+            self.__add_final_function(line, self.__functions[following.address] if following is not None else None)
+            self.__functions[address] = line
+        return self.__functions[chain[0]] if chain else self.__functions[address]
+
+    def parse(self) -> List[List[ContractLine]]:
+        """
+        Decompiles the contract into blocks of pseudo-code. If the contract
+        was created with a cache, the result is looked up in and stored to it,
+        unless some of it was disassembled to stay within the budget.
+        """
+        if self.cache is not None:
+            self.line_blocks = self.cache.fetch('decompile', self.code, lambda code: self.__parse(),
+                                                keep=lambda lines: self.budget is None or not self.budget.degraded)
+            return self.line_blocks
+        return self.__parse()
+
+    def __count_lines(self) -> int:
+        return sum(len(block.lines) for block in self.line_blocks)
+
+    def __parse(self) -> List[List[ContractLine]]:
+        self.line_blocks = []
+        with Phase(self.stats, 'translate') as counters:
+            for address in self.__blocks:
+                line = self.__translate(self.__blocks[address])
+                self.functions.add_func(address, line)
+                self.line_blocks.append(line)
+            if self.stats is not None:
+                counters['blocks'] = len(self.line_blocks)
+                counters['reused'] = self.__reused
+                counters['lines'] = self.__count_lines()
+        with Phase(self.stats, 'simplify') as counters:
+            self.__simplify(self.line_blocks)
+            if self.stats is not None:
+                counters['lines'] = self.__count_lines()
+        with Phase(self.stats, 'add_final_functions') as counters:
+            self.__add_final_functions()
+            if self.stats is not None:
+                counters['lines'] = self.__count_lines()
+        return self.line_blocks
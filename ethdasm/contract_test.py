@@ -1,6 +1,8 @@
 import unittest
 
+import ethdasm.contract
 from ethdasm.contract import Contract, JumpLine
+from ethdasm.stats import Stats
 
 
 class TestContract(unittest.TestCase):
@@ -42,6 +44,140 @@ class TestContract(unittest.TestCase):
         self.assertEqual(c.line_blocks[1].lines[-1].args[0].value, 3)
         self.assertTrue(c.line_blocks[1].lines[-1].args[0].is_variable)
 
+    def test_return_values(self):
+        """
+        Tests that every value left on the stack is passed on:
+            PUSH 01
+            PUSH 02
+            JUMPDEST
+            ADD
+        The jump into the second block should pass both values, top first.
+        """
+        c = Contract('600160025b01')
+        c.parse()
+        jump = c.line_blocks[0].lines[-1]
+        self.assertIsInstance(jump, JumpLine)
+        self.assertEqual([arg.value for arg in jump.args], [2, 1])
+
+    def test_pass_through_arguments(self):
+        """
+        Tests falling into a function that needs more values than the block
+        before it returns:
+            PUSH 01
+            POP
+            JUMPDEST
+            ADD
+        Both values come from below the stack of main and are passed on.
+        """
+        c = Contract('6001505b01')
+        c.parse()
+        jump = c.line_blocks[0].lines[-1]
+        self.assertEqual(str(jump), 'func1(arg0, arg1)')
+        self.assertEqual(c.line_blocks[0].args_needed, 2)
+
+    def test_pass_through_chain(self):
+        """
+        Tests that a caller passes on the arguments its callee only needs
+        once the callee passes values through itself:
+            CALLER
+            POP
+            JUMPDEST
+            CALLER
+            JUMPDEST
+            ADD
+            STOP
+        """
+        c = Contract('33505b335b0100')
+        c.parse()
+        self.assertEqual([str(block) for block in c.line_blocks],
+                         ['def main(arg0):', 'def func1(arg0):', 'def func2(arg0, arg1):'])
+        self.assertEqual(str(c.line_blocks[0].lines[-1]), 'func1(arg0)')
+        self.assertEqual(str(c.line_blocks[1].lines[-1]), 'func2(var2, arg0)')
+        lazy = Contract('33505b335b0100')
+        self.assertEqual(str(lazy.function(name='main').lines[-1]), 'func1(arg0)')
+        self.assertEqual(str(lazy.function(name='func1')), 'def func1(arg0):')
+
+    def test_lazy_function(self):
+        """
+        Tests decompiling a single function through the dispatcher:
+            PUSH e0
+            PUSH 02
+            EXP
+            PUSH 00
+            CALLDATALOAD
+            DIV
+            DUP1
+            PUSH4 12345678
+            EQ
+            PUSH 14
+            JUMPI
+            STOP
+            JUMPDEST
+            CALLER
+            STOP
+        """
+        c = Contract('60e060020a6000350480631234567814601457005b3300')
+        func = c.function(selector=0x12345678)
+        self.assertEqual(func.name, 'func1')
+        self.assertEqual(func.lines[0].instruction.name, 'CALLER')
+        self.assertIs(c.function(address=0x14), func)
+        self.assertIs(c.function(name='func1'), func)
+        self.assertIsNone(c.function(selector=0x87654321))
+        self.assertEqual(c.function(name='main').name, 'main')
+
+    def test_interned_constants(self):
+        """
+        Tests that equal constants share one Output:
+            PUSH 20
+            MLOAD
+            PUSH 20
+            MLOAD
+        """
+        c = Contract('602051602051')
+        first, second = c.blocks[0].instructions[0].arguments[0], c.blocks[0].instructions[1].arguments[0]
+        self.assertIs(first, second)
+        self.assertEqual(str(first), '0x20')
+        self.assertFalse(first.is_variable or first.is_arg)
+
+    def test_block_reuse(self):
+        """
+        Tests that blocks of the same shape share one translation, linked to
+        their own jump targets:
+            JUMPDEST
+            PUSH 4
+            JUMP
+            JUMPDEST
+            PUSH 8
+            JUMP
+            JUMPDEST
+            STOP
+        """
+        stats = Stats()
+        c = Contract('5b6004565b6008565b00', stats=stats)
+        lines = c.parse()
+        self.assertEqual(str(lines[0].lines[0]), 'func2()')
+        self.assertEqual(str(lines[1].lines[0]), 'func3()')
+        self.assertGreaterEqual(stats.phases['translate']['reused'], 1)
+
+    def test_hot_template(self):
+        """
+        Tests that a template used again is the last to be evicted: with
+        room for two, CALLER survives ORIGIN and ADDRESS after its reuse.
+        """
+        saved = ethdasm.contract._templates.copy(), ethdasm.contract._MAX_TEMPLATES
+        ethdasm.contract._templates.clear()
+        ethdasm.contract._MAX_TEMPLATES = 2
+        try:
+            for code in ('33', '32', '33', '30'):
+                Contract(code).parse()
+            stats = Stats()
+            Contract('33', stats=stats).parse()
+            self.assertEqual(stats.phases['translate']['reused'], 1)
+        finally:
+            ethdasm.contract._templates.clear()
+            ethdasm.contract._templates.update(saved[0])
+            ethdasm.contract._MAX_TEMPLATES = saved[1]
+
     def test_single_jumpdest(self):
         """
         Tests the following EVM code decompilation:
@@ -11,19 +11,32 @@ class OpCode(typing.NamedTuple):
 	equivalent_function: typing.Optional[typing.Callable]
 	infix_operator: typing.Optional[str]
 	tags: typing.List[str]
+	code: int = -1
+	is_push: bool = False
+	push_width: int = 0
+	is_dup: bool = False
+	is_swap: bool = False
+	is_jump: bool = False
+	is_jumpi: bool = False
+	terminates: bool = False
 
+	def __reduce__(self):
+		# equivalent_function is a lambda, so opcodes are pickled by code
+		return (get_opcode_by_code, (self.code,))
+
+# as in the EVM, a zero divisor or modulus gives 0
 _OPCODES = {
 	'00': OpCode(name = 'STOP', removed = 0, added = 0, args = 0, equivalent_function = None, infix_operator = None, tags=['moves']),
 	'01': OpCode(name = 'ADD', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: a + b, infix_operator='+', tags=[]),
 	'02': OpCode(name = 'MUL', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: a * b, infix_operator='*', tags=[]),
 	'03': OpCode(name = 'SUB', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: a - b, infix_operator='-', tags=[]),
-	'04': OpCode(name = 'DIV', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: a // b, infix_operator='//', tags=[]),
-	'05': OpCode(name = 'SDIV', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: a // b, infix_operator='//', tags=[]), #
-	'06': OpCode(name = 'MOD', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: a % b, infix_operator='%', tags=[]),
-	'07': OpCode(name = 'SMOD', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: a % b, infix_operator='%', tags=[]),
-	'08': OpCode(name = 'ADDMOD', removed = 3, added = 1, args = 0, equivalent_function = lambda a, b, c: (a + b) % c, infix_operator=None, tags=[]),
-	'09': OpCode(name = 'MULMOD', removed = 3, added = 1, args = 0, equivalent_function = lambda a, b, c: (a * b) % c, infix_operator=None, tags=[]),
-	'0a': OpCode(name = 'EXP', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: a ** b, infix_operator='**', tags=[]),
+	'04': OpCode(name = 'DIV', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: a // b if b else 0, infix_operator='//', tags=[]),
+	'05': OpCode(name = 'SDIV', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: a // b if b else 0, infix_operator='//', tags=[]), #
+	'06': OpCode(name = 'MOD', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: a % b if b else 0, infix_operator='%', tags=[]),
+	'07': OpCode(name = 'SMOD', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: a % b if b else 0, infix_operator='%', tags=[]),
+	'08': OpCode(name = 'ADDMOD', removed = 3, added = 1, args = 0, equivalent_function = lambda a, b, c: (a + b) % c if c else 0, infix_operator=None, tags=[]),
+	'09': OpCode(name = 'MULMOD', removed = 3, added = 1, args = 0, equivalent_function = lambda a, b, c: (a * b) % c if c else 0, infix_operator=None, tags=[]),
+	'0a': OpCode(name = 'EXP', removed = 2, added = 1, args = 0, equivalent_function = lambda a, b: pow(a, b, 2 ** 256), infix_operator='**', tags=[]),
 	'0b': OpCode(name = 'SIGNEXTEND', removed = 2, added = 1, args = 0, equivalent_function = None, infix_operator=None, tags=[]),
 	'10': OpCode(name = 'LT', removed = 2, added = 1, args = 0, equivalent_function = None, infix_operator='<', tags=[]),
 	'11': OpCode(name = 'GT', removed = 2, added = 1, args = 0, equivalent_function = None, infix_operator='>', tags=[]),
@@ -96,11 +109,32 @@ for i in range(0, 256):
 	if not _OPCODES.get(hex(i)[2:].zfill(2)):
 			_OPCODES[hex(i)[2:].zfill(2)] = OpCode('THROW', 0, 0, 0, None, None, ['moves'])
 
-def get_opcode_by_code(sym: str) -> OpCode:
-	return _OPCODES[sym]
+def _classify(code: int, op: OpCode) -> OpCode:
+	"""
+	Precomputes the classification flags of an opcode so hot loops can
+	read attributes instead of matching on the mnemonic.
+	"""
+	return op._replace(
+		code=code,
+		is_push=0x60 <= code <= 0x7f,
+		push_width=op.args,
+		is_dup=0x80 <= code <= 0x8f,
+		is_swap=0x90 <= code <= 0x9f,
+		is_jump=op.name in ('JUMP', 'JUMPI'),
+		is_jumpi=op.name == 'JUMPI',
+		terminates='moves' in op.tags)
+
+_OPCODE_TABLE = [_classify(i, _OPCODES[hex(i)[2:].zfill(2)]) for i in range(256)]
+_OPCODES = {hex(i)[2:].zfill(2): op for i, op in enumerate(_OPCODE_TABLE)}
+
+_MNEMONICS = {}
+for _op in _OPCODE_TABLE:
+	_MNEMONICS.setdefault(_op.name, _op)
+
+def get_opcode_by_code(sym: typing.Union[int, str]) -> OpCode:
+	if isinstance(sym, str):
+		sym = int(sym, 16)
+	return _OPCODE_TABLE[sym]
 
 def get_opcode_by_mnemonic(mne: str) -> OpCode:
-	i = 0
-	while _OPCODES[hex(i)[2:].zfill(2)].name != mne:
-		i += 1
-	return _OPCODES[hex(i)[2:].zfill(2)]
\ No newline at end of file
+	return _MNEMONICS[mne]
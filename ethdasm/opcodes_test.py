@@ -14,6 +14,23 @@ class TestOpcodes(unittest.TestCase):
         Tests getting the opcode with code 02 (MUL)
         """
         self.assertEqual(get_opcode_by_code('02').name, 'MUL')
+        self.assertEqual(get_opcode_by_code(0x02).name, 'MUL')
+    def test_classification_flags(self):
+        """
+        Tests the precomputed classification flags.
+        """
+        push32 = get_opcode_by_mnemonic('PUSH32')
+        self.assertTrue(push32.is_push)
+        self.assertEqual(push32.push_width, 32)
+        self.assertEqual(push32.code, 0x7f)
+        self.assertTrue(get_opcode_by_code(0x8f).is_dup)
+        self.assertTrue(get_opcode_by_code(0x90).is_swap)
+        self.assertTrue(get_opcode_by_mnemonic('JUMPI').is_jump)
+        self.assertFalse(get_opcode_by_mnemonic('JUMPI').terminates)
+        self.assertTrue(get_opcode_by_mnemonic('JUMP').terminates)
+        self.assertTrue(get_opcode_by_mnemonic('JUMPI').is_jumpi)
+        self.assertFalse(get_opcode_by_mnemonic('JUMP').is_jumpi)
+        self.assertFalse(get_opcode_by_mnemonic('ADD').is_push)
 
 if __name__ == '__main__':
     unittest.main()
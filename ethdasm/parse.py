@@ -2,12 +2,19 @@
 Parses opcodes into blocks of simplified opcodes.
 """
 import math
-from typing import List
+from array import array
+from bisect import bisect_right
+from collections import deque
+from collections.abc import Sequence
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 import ethdasm.opcodes as oc
+from ethdasm.budget import Budget
+from ethdasm.stats import Phase, Stats
 
 
 class Instruction:
+    __slots__ = ('instruction', 'address', 'arguments')
     instruction: oc.OpCode
     address: int
     arguments: List[str]
@@ -18,150 +25,603 @@ class Instruction:
     def __repr__(self):
         return self.instruction.name
 
+class InstructionStream:
+    """
+    Stores instructions as parallel columns of opcode byte, address and
+    argument position, with the arguments of all instructions kept in one
+    side table. This takes a fraction of the memory of one Instruction
+    object per opcode.
+    """
+    __slots__ = ('opcodes', 'addresses', 'arg_starts', 'arg_counts', 'values')
+
+    def __init__(self, instructions: Iterable[Instruction]=()):
+        self.opcodes = array('B')
+        self.addresses = array('I')
+        self.arg_starts = array('I')
+        self.arg_counts = array('b')
+        self.values = []
+        for instruction in instructions:
+            self.append(instruction)
+
+    def append(self, instruction: Instruction):
+        self.opcodes.append(instruction.instruction.code)
+        self.addresses.append(instruction.address)
+        self.arg_starts.append(len(self.values))
+        if instruction.arguments is None:
+            self.arg_counts.append(-1)
+        else:
+            self.arg_counts.append(len(instruction.arguments))
+            self.values.extend(instruction.arguments)
+
+    def get_arguments(self, index: int) -> Optional[list]:
+        count = self.arg_counts[index]
+        if count < 0:
+            return None
+        start = self.arg_starts[index]
+        return self.values[start:start + count]
+
+    def set_arguments(self, index: int, arguments: Optional[list]):
+        if arguments is None:
+            self.arg_counts[index] = -1
+            return
+        count = len(arguments)
+        if count > max(self.arg_counts[index], 0):
+            self.arg_starts[index] = len(self.values)
+            self.values.extend(arguments)
+        else:
+            start = self.arg_starts[index]
+            self.values[start:start + count] = arguments
+        self.arg_counts[index] = count
+
+    def __len__(self):
+        return len(self.opcodes)
+
+class InstructionView:
+    """
+    An instruction stored in an InstructionStream. Behaves like an
+    Instruction; arguments are copied out of the stream on access and
+    written back on assignment.
+    """
+    __slots__ = ('stream', 'index')
+
+    def __init__(self, stream: InstructionStream, index: int):
+        self.stream = stream
+        self.index = index
+
+    @property
+    def instruction(self) -> oc.OpCode:
+        return oc.get_opcode_by_code(self.stream.opcodes[self.index])
+
+    @property
+    def address(self) -> int:
+        return self.stream.addresses[self.index]
+
+    @property
+    def arguments(self) -> Optional[list]:
+        return self.stream.get_arguments(self.index)
+
+    @arguments.setter
+    def arguments(self, arguments: Optional[list]):
+        self.stream.set_arguments(self.index, arguments)
+
+    def __repr__(self):
+        return self.instruction.name
+
+class InstructionRange(Sequence):
+    """
+    The instructions of a block, as a range of an InstructionStream.
+    """
+    __slots__ = ('stream', 'start', 'stop')
+
+    def __init__(self, stream: InstructionStream, start: int, stop: int):
+        self.stream = stream
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('instruction index out of range')
+        return InstructionView(self.stream, self.start + index)
+
+    def __iter__(self):
+        for index in range(self.start, self.stop):
+            yield InstructionView(self.stream, index)
+
 class Block:
     """
     Represents a block of code which can be jumped to within an
     ethereum contract.
     """
-    def __init__(self, address):
+    def __init__(self, address, instructions: Optional[Sequence]=None):
         self.address = address
-        self.instructions = []
+        self.instructions = instructions if instructions is not None else []
 
     def add_instruction(self, instruction: Instruction):
         """
-        Adds an instruction to the block.
+        Adds an instruction to the block. A block that is a range of a
+        parsed stream is copied to a list of its own first.
         """
+        if isinstance(self.instructions, InstructionRange):
+            self.instructions = list(self.instructions)
         self.instructions.append(instruction)
 
+    def fingerprint(self) -> bytes:
+        """
+        A canonical fingerprint of the shape of the block: its opcodes and
+        how many arguments each has. Addresses and argument values, jump
+        targets included, are left out, so the same code compiled into
+        different contracts or at different addresses has one fingerprint.
+        """
+        instructions = self.instructions
+        if isinstance(instructions, InstructionRange):
+            stream, start, stop = instructions.stream, instructions.start, instructions.stop
+            return stream.opcodes[start:stop].tobytes() + stream.arg_counts[start:stop].tobytes()
+        return (bytes(operation.instruction.code for operation in instructions) +
+                array('b', [-1 if operation.arguments is None else len(operation.arguments)
+                            for operation in instructions]).tobytes())
+
+class ControlIndex:
+    """
+    Lookup tables over parsed blocks, built once: a bitmap of the addresses
+    of valid JUMPDESTs, which never includes PUSH data, the sorted start
+    addresses of the blocks and a table from address to the index of the
+    instruction at that address.
+
+    The blocks are optimized, so a PUSH folded into the instruction that
+    uses it is no longer an instruction. Its address is still within its
+    block, but no instruction starts there.
+    """
+    __slots__ = ('jumpdests', 'starts', 'instructions')
+
+    def __init__(self, blocks: List[Block]):
+        ranges = [block.instructions for block in blocks]
+        if ranges and all(isinstance(r, InstructionRange) and r.stream is ranges[0].stream for r in ranges):
+            # the blocks of a parse cover one stream, read its columns directly
+            stream = ranges[0].stream
+            addresses, opcodes = stream.addresses, stream.opcodes
+        else:
+            addresses = [operation.address for r in ranges for operation in r]
+            opcodes = [operation.instruction.code for r in ranges for operation in r]
+        end = max(addresses) + 1 if addresses else 0
+        self.jumpdests = bytearray((end + 7) // 8)
+        self.starts = array('I', [block.address for block in blocks])
+        self.instructions = array('i', [-1]) * end
+        jumpdest = oc.get_opcode_by_mnemonic('JUMPDEST').code
+        for index, (address, opcode) in enumerate(zip(addresses, opcodes)):
+            self.instructions[address] = index
+            if opcode == jumpdest:
+                self.jumpdests[address >> 3] |= 1 << (address & 7)
+
+    def is_jumpdest(self, address: int) -> bool:
+        """
+        Returns whether a jump to the address lands on a JUMPDEST.
+        """
+        return 0 <= address < len(self.instructions) and bool(self.jumpdests[address >> 3] & 1 << (address & 7))
+
+    def block_of(self, address: int) -> Optional[int]:
+        """
+        Returns the index of the block containing the address, or None if
+        it lies outside the code or after the last instruction. Addresses
+        before the first instruction left after optimization were folded
+        into it, and belong to the first block.
+        """
+        if not 0 <= address < len(self.instructions):
+            return None
+        return max(bisect_right(self.starts, address) - 1, 0)
+
+    def block_at(self, address: int) -> Optional[int]:
+        """
+        Returns the index of the block starting at the address.
+        """
+        index = self.block_of(address)
+        return index if index is not None and self.starts[index] == address else None
+
+    def instruction_at(self, address: int) -> Optional[int]:
+        """
+        Returns the index, counting over all blocks, of the instruction at
+        the address, or None if no instruction starts there. This includes
+        PUSH data and pushes folded away by optimization; block_of still
+        finds their block.
+        """
+        if not 0 <= address < len(self.instructions):
+            return None
+        index = self.instructions[address]
+        return index if index >= 0 else None
+
 class ParseException(Exception):
     pass
 
+class Segments(NamedTuple):
+    """
+    Byte ranges ``(start, end)`` of the parts of a contract's bytecode. Only
+    ``runtime`` is always present; it is the whole code if no constructor
+    or metadata was found. ``data`` is whatever follows the runtime code in
+    creation bytecode, usually the constructor arguments.
+    """
+    creation: Optional[Tuple[int, int]]
+    runtime: Tuple[int, int]
+    metadata: Optional[Tuple[int, int]]
+    data: Optional[Tuple[int, int]]
+
+# CBOR keys of the metadata solc appends to the runtime code
+_METADATA_KEYS = (b'ipfs', b'bzzr0', b'bzzr1', b'solc', b'experimental')
+# PUSH0, which pushes a zero without an argument
+_PUSH0 = 0x5f
+# DIV and SHR, which extract the selector from the call data; SHR is
+# newer than the opcode table and decodes as THROW
+_SELECTOR_SHIFTS = frozenset((0x04, 0x1c))
+
 class Parser:
     """
     Parses EVM code into blocks of optimized code.
     """
 
     @staticmethod
-    def __parse_ops(contract_code: str) -> List[Instruction]:
+    def to_bytes(contract_code: Union[str, bytes, bytearray, memoryview]) -> memoryview:
+        """
+        Converts contract code to a memoryview over the raw bytecode. Hex
+        strings are decoded once; binary input is used without copying.
+        """
+        if isinstance(contract_code, str):
+            try:
+                contract_code = bytes.fromhex(contract_code)
+            except ValueError as e:
+                raise ParseException('Invalid hex contract code.') from e
+        return memoryview(contract_code)
+
+    @staticmethod
+    def decode(contract_code: Union[str, bytes, bytearray, memoryview]) -> List[Instruction]:
+        """
+        Decodes hex or binary contract code into a list of instructions.
+        """
+        return Parser.__parse_ops(Parser.to_bytes(contract_code))
+
+    @staticmethod
+    def iter_instructions(contract_code: Union[str, bytes, bytearray, memoryview], optimize: bool=False,
+                          window: int=256) -> Iterator[Instruction]:
+        """
+        Decodes contract code lazily, so a scan can stop as soon as it has
+        its answer. With ``optimize``, jump destinations and constant
+        arguments are moved into the instructions as parse does, holding
+        back at most ``window`` pushes that may still become arguments.
+        The result only differs from parse if a run of constants is longer.
+        """
+        instructions = Parser.__iter_ops(Parser.to_bytes(contract_code))
+        if optimize:
+            instructions = Parser.__optimize_arguments(Parser.__optimize_jump_args(instructions), window)
+        return instructions
+
+    @staticmethod
+    def iter_blocks(contract_code: Union[str, bytes, bytearray, memoryview], optimize: bool=True,
+                    window: int=256) -> Iterator[Block]:
+        """
+        Yields the blocks of contract code one at a time, each as soon as
+        the JUMPDEST starting the next one is decoded. The instructions of
+        a block are a plain list.
+        """
+        return Parser.__iter_blocks(Parser.iter_instructions(contract_code, optimize, window))
+
+    @staticmethod
+    def __parse_ops(contract_code: memoryview) -> List[Instruction]:
         """
         Parse contract code and generates a list of (address, opcode, arguments)
         """
-        opcodes = []
+        return list(Parser.__iter_ops(contract_code))
+
+    @staticmethod
+    def __iter_ops(contract_code: memoryview) -> Iterator[Instruction]:
+        """
+        Decodes contract code one instruction at a time.
+        """
         address = 0
-        while contract_code:
-            offset = 0
-            instruction = contract_code[0:2]
-            contract_code = contract_code[2:]
-            offset += 1
-            instr = oc.get_opcode_by_code(instruction)
+        end = len(contract_code)
+        while address < end:
+            instr = oc.get_opcode_by_code(contract_code[address])
             args = None
-            if instr.args > 0:
-                if len(contract_code) < 2 * instr.args:
-                    opcodes.append(Instruction(oc.get_opcode_by_mnemonic('THROW'), address, None))
+            if instr.is_push:
+                if end - address - 1 < instr.push_width:
+                    yield Instruction(oc.get_opcode_by_mnemonic('THROW'), address, None)
+                    return
+                args = [int.from_bytes(contract_code[address + 1:address + 1 + instr.push_width], 'big')]
+            yield Instruction(instr, address, args)
+            address += 1 + instr.push_width
+
+    @staticmethod
+    def selectors(contract_code: Union[str, bytes, bytearray, memoryview]) -> Dict[int, int]:
+        """
+        Finds the function dispatcher without decompiling the contract.
+        Returns a mapping of 4-byte selectors to the address the dispatcher
+        jumps to, recognising both
+            PUSH4 selector, DUP2, EQ, PUSH dest, JUMPI
+        and
+            DUP1, PUSH4 selector, EQ, PUSH dest, JUMPI.
+        Comparisons only count once the selector has been extracted from
+        the call data, by a CALLDATALOAD followed by a SHR or DIV. The scan
+        stops at the first function the dispatcher jumps to.
+        """
+        selectors = {}
+        targets = set()
+        loaded = extracted = False
+        window = deque([None] * 5, maxlen=5)
+        for operation in Parser.__iter_ops(Parser.to_bytes(contract_code)):
+            name = operation.instruction.name
+            if name == 'JUMPDEST' and operation.address in targets:
+                break
+            window.append(operation)
+            if name == 'CALLDATALOAD':
+                loaded = True
+            elif loaded and operation.instruction.code in _SELECTOR_SHIFTS:
+                extracted = True
+            if not extracted or not operation.instruction.is_jumpi:
+                continue
+            second, first, comparison, dest = window[0], window[1], window[2], window[3]
+            if dest is None or not dest.instruction.is_push or comparison.instruction.name != 'EQ':
+                continue
+            for push, dup in ((first, second), (second, first)):
+                if push.instruction.is_push and push.instruction.push_width <= 4 and dup.instruction.is_dup:
+                    selectors.setdefault(push.arguments[0], dest.arguments[0])
+                    targets.add(dest.arguments[0])
                     break
-                args = [int(contract_code[0:2 * instr.args], 16)]
-                contract_code = contract_code[2 * instr.args:]
-                offset += instr.args
-            opcodes.append(Instruction(instr, address, args))
-            address += offset
-        return opcodes
+        return selectors
+
+    @staticmethod
+    def segments(contract_code: Union[str, bytes, bytearray, memoryview]) -> Segments:
+        """
+        Splits creation bytecode into the constructor, the runtime code it
+        deploys and the data after it, and finds the CBOR metadata at the
+        end of the runtime code. Runtime bytecode is a single segment,
+        minus its metadata.
+        """
+        code = Parser.to_bytes(contract_code)
+        creation = data = metadata = None
+        start, end = 0, len(code)
+        runtime = Parser.__find_runtime(code)
+        if runtime is not None:
+            creation = (0, runtime[0])
+            start, end = runtime
+            if end < len(code):
+                data = (end, len(code))
+        length = Parser.__metadata_length(code[start:end])
+        if length:
+            metadata = (end - length, end)
+            end -= length
+        return Segments(creation, (start, end), metadata, data)
+
+    @staticmethod
+    def segment(contract_code: Union[str, bytes, bytearray, memoryview], name: str='runtime') -> memoryview:
+        """
+        Returns one segment of the bytecode by name, or all of it for 'all'.
+        Missing segments are empty.
+        """
+        code = Parser.to_bytes(contract_code)
+        if name == 'all':
+            return code
+        bounds = getattr(Parser.segments(code), name)
+        return code[bounds[0]:bounds[1]] if bounds is not None else code[:0]
+
+    @staticmethod
+    def __find_runtime(code: memoryview) -> Optional[Tuple[int, int]]:
+        """
+        Finds the runtime code a constructor deploys with
+            CODECOPY(dest, offset, size) ... RETURN(dest, size)
+        by tracking the constants on the stack along the code. The copied
+        range has to lie after the CODECOPY and within the code.
+        """
+        stack = []
+        copied = None
+        def pop():
+            return stack.pop() if stack else None
+        for operation in Parser.__iter_ops(code):
+            opcode = operation.instruction
+            if opcode.code == _PUSH0:
+                stack.append(0)
+            elif opcode.is_push:
+                stack.append(operation.arguments[0])
+            elif opcode.is_dup:
+                stack.append(stack[-opcode.removed] if len(stack) >= opcode.removed else None)
+            elif opcode.is_swap:
+                if len(stack) >= opcode.removed:
+                    stack[-1], stack[-opcode.removed] = stack[-opcode.removed], stack[-1]
+            elif opcode.name == 'CODECOPY':
+                dest, offset, size = pop(), pop(), pop()
+                if None not in (dest, offset, size) and operation.address < offset and offset + size <= len(code):
+                    copied = (dest, offset, size)
+            elif opcode.name == 'RETURN':
+                dest, size = pop(), pop()
+                if copied is not None and (dest, size) == (copied[0], copied[2]):
+                    return copied[1], copied[1] + copied[2]
+                copied = None
+            else:
+                for _ in range(opcode.removed):
+                    pop()
+                stack.extend([None] * opcode.added)
+        return None
+
+    @staticmethod
+    def __metadata_length(code: memoryview) -> int:
+        """
+        Returns the length of the CBOR metadata and its 2-byte length
+        suffix at the end of the code, or 0 if there is none.
+        """
+        if len(code) < 2:
+            return 0
+        length = int.from_bytes(code[-2:], 'big') + 2
+        if length > len(code) or not 0xa1 <= code[-length] <= 0xb7:
+            return 0
+        trailer = bytes(code[-length:])
+        return length if any(key in trailer for key in _METADATA_KEYS) else 0
 
     @staticmethod
     def __parse_blocks(instructions: [Instruction]) -> [Block]:
         """
         Parses contract code and generates a list of blocks which contain
-        opcodes within the block.
+        opcodes within the block. The instructions are packed into one
+        InstructionStream that the blocks are ranges of. Empty code has no
+        blocks.
         """
+        if not instructions:
+            return []
+        stream = InstructionStream(instructions)
         blocks = []
-        current_block = Block(instructions[0].address)
-        for operation in instructions:
+        address = instructions[0].address
+        start = 0
+        for index, operation in enumerate(instructions):
             if operation.instruction.name == 'JUMPDEST':
-                blocks.append(current_block)
-                current_block = Block(operation.address)
-            current_block.add_instruction(operation)
-        blocks.append(current_block)
+                blocks.append(Block(address, InstructionRange(stream, start, index)))
+                address = operation.address
+                start = index
+        blocks.append(Block(address, InstructionRange(stream, start, len(instructions))))
         return blocks
 
     @staticmethod
-    def __optimize_jump_args(instructions: [Instruction]) -> [Instruction]:
-        i = 0
-        while i < len(instructions) - 2:
-            if 'PUSH' in instructions[i].instruction.name:
-                if 'JUMP' == instructions[i + 1].instruction.name:
-                    instructions[i + 1].arguments = instructions[i].arguments
-                    del instructions[i]
-                elif 'PUSH' in instructions[i + 1].instruction.name and 'JUMPI' == instructions[i + 2].instruction.name:
-                    instructions[i + 1].arguments = instructions[i].arguments + instructions[i + 1].arguments
-                    del instructions[i]
-                    del instructions[i + 1]
-            i += 1
-        return instructions
+    def __iter_blocks(instructions: Iterable[Instruction]) -> Iterator[Block]:
+        block = None
+        for operation in instructions:
+            if block is None:
+                block = Block(operation.address)
+            if operation.instruction.name == 'JUMPDEST':
+                yield block
+                block = Block(operation.address)
+            block.add_instruction(operation)
+        if block is not None:
+            yield block
 
     @staticmethod
-    def __optimize(instructions: [Instruction]) -> [Instruction]:
-        Parser.__optimize_jump_args(instructions)
-        last_len = len(instructions) + 1
-        for i in range(2):
-            last_len = len(instructions)
-            Parser.__optimize_arguments(instructions)
-            Parser.__optimize_math(instructions)
-        Parser.__optimize_arguments(instructions)
+    def __optimize_jump_args(instructions: Iterable[Instruction]) -> Iterator[Instruction]:
+        """
+        Moves the destination of PUSH/JUMP and PUSH/PUSH/JUMPI sequences into
+        the arguments of the jump. Looks ahead at most three instructions.
+        """
+        window = deque()
+        for operation in instructions:
+            window.append(operation)
+            if len(window) < 3:
+                continue
+            first = window[0]
+            if first.instruction.is_push:
+                second, third = window[1], window[2]
+                if second.instruction.is_jump and not second.instruction.is_jumpi:
+                    second.arguments = first.arguments
+                    yield second
+                    window.popleft()
+                    window.popleft()
+                    continue
+                elif second.instruction.is_push and third.instruction.is_jumpi:
+                    second.arguments = first.arguments + second.arguments
+                    yield second
+                    window.clear()
+                    continue
+            yield window.popleft()
+        yield from window
+
+    @staticmethod
+    def __optimize(instructions: [Instruction], stats: Optional[Stats]=None,
+                   budget: Optional[Budget]=None) -> [Instruction]:
+        """
+        Runs the optimization passes in order. A pass is skipped once the
+        deadline of the budget has passed.
+        """
+        if budget is not None and not budget.allows_instructions(len(instructions)):
+            budget.degrade(None, '{} instructions, over the limit of {}: not optimized'.format(
+                len(instructions), budget.max_instructions))
+            return instructions
+        if budget is not None and budget.expired():
+            budget.degrade(None, 'deadline of {}s passed: not optimized'.format(budget.seconds))
+            return instructions
+        with Phase(stats, 'optimize_jump_args') as counters:
+            counters['instructions_in'] = len(instructions)
+            instructions = list(Parser.__optimize_jump_args(instructions))
+            counters['instructions_out'] = len(instructions)
+        if budget is not None and budget.expired():
+            budget.degrade(None, 'deadline of {}s passed: constant arguments not folded'.format(budget.seconds))
+            return instructions
+        with Phase(stats, 'optimize_arguments') as counters:
+            counters['instructions_in'] = len(instructions)
+            instructions = list(Parser.__optimize_arguments(instructions))
+            counters['instructions_out'] = len(instructions)
         return instructions
 
     @staticmethod
-    def parse(contract_code: str) -> [Block]:
+    def parse(contract_code: Union[str, bytes, bytearray, memoryview], cache=None,
+              stats: Optional[Stats]=None, budget: Optional[Budget]=None) -> [Block]:
         """
-        Parses contract code into a list of blocks.
+        Parses contract code into a list of blocks. Accepts either a hex
+        string or raw binary bytecode. Results are looked up in and stored
+        to ``cache``, an ethdasm.cache.ResultCache, if one is given. Timings
+        and counters of each phase are added to ``stats`` if one is given.
+        Code over the limits of ``budget`` is left unoptimized; such results
+        are not stored to the cache.
         """
-        opcodes = Parser.__parse_ops(contract_code)
-        optimized_opcodes = Parser.__optimize(opcodes)
-        blocks = Parser.__parse_blocks(optimized_opcodes)
+        if cache is not None:
+            return cache.fetch('parse', contract_code, lambda code: Parser.parse(code, stats=stats, budget=budget),
+                               keep=lambda blocks: budget is None or not budget.degraded)
+        with Phase(stats, 'decode') as counters:
+            opcodes = Parser.decode(contract_code)
+            counters['instructions'] = len(opcodes)
+        optimized_opcodes = Parser.__optimize(opcodes, stats, budget)
+        with Phase(stats, 'parse_blocks') as counters:
+            blocks = Parser.__parse_blocks(optimized_opcodes)
+            counters['blocks'] = len(blocks)
         return blocks
 
     @staticmethod
-    def __optimize_arguments(instructions: [Instruction]) -> [Instruction]:
+    def __optimize_arguments(instructions: Iterable[Instruction],
+                             window: Optional[int]=None) -> Iterator[Instruction]:
         """
         Removes calls with preceding pushes and adds a list of arguments to them instead.
+        Constant math is folded as soon as its arguments are known, so the folded
+        value can feed the next instruction and one pass reaches a fixed point.
+        Only a run of pushes can still become arguments, so everything up to the
+        last other instruction is final and yielded. At most ``window`` pushes
+        are held back; older ones are yielded as they are.
         """
-        i = 0
-        while i < len(instructions):
-            num_pushes = instructions[i].instruction.removed
-            args = []
-            not_static = num_pushes == 0
-            if instructions[i].arguments is not None:
-                not_static = True
-                num_pushes = 0
-            if 'DUP' in instructions[i].instruction.name or 'SWAP' in instructions[i].instruction.name:
-                i += 1
-                continue
-            if i - num_pushes < 0:
-                break
-            for push_num in range(i - num_pushes, i):
-                not_static = not_static or 'PUSH' not in instructions[push_num].instruction.name
-            if not_static:
-                i += 1
+        pending = deque()
+        emitted = 0
+        instructions = iter(instructions)
+        for operation in instructions:
+            num_pushes = operation.instruction.removed
+            if num_pushes == 0 or operation.arguments is not None or \
+                    operation.instruction.is_dup or operation.instruction.is_swap:
+                pass
+            elif emitted + len(pending) < num_pushes:
+                yield from pending
+                yield operation
+                yield from instructions
+                return
+            elif len(pending) >= num_pushes:
+                operation.arguments = [pending.pop().arguments[0] for _ in range(num_pushes)]
+                operation = Parser.__optimize_math(operation)
+            if operation.instruction.is_push:
+                pending.append(operation)
+                if window is not None and len(pending) > window:
+                    emitted += 1
+                    yield pending.popleft()
                 continue
-            for push_num in range(num_pushes):
-                args.append(instructions[i-push_num-1].arguments[0])
-                del instructions[i-push_num-1]
-            if not not_static:
-                instructions[i - num_pushes].arguments = args
-            i += 1
-        return instructions
+            emitted += len(pending) + 1
+            yield from pending
+            pending.clear()
+            yield operation
+        yield from pending
 
     @staticmethod
     def num_bytes(i: int):
         return math.ceil(math.log(i + 1) / math.log(16) / 2)
 
     @staticmethod
-    def __optimize_math(instructions: [Instruction]) -> [Instruction]:
-        i = 0
-        while i < len(instructions):
-            equiv_func = instructions[i].instruction.equivalent_function
-            if instructions[i].arguments and equiv_func and len(instructions[i].arguments) == instructions[i].instruction.removed:
-                equiv = equiv_func(*instructions[i].arguments) & (2 ** 256 - 1)
-                push_num = Parser.num_bytes(equiv)
-                op_code = hex(96 + push_num)[2:]
-                instructions[i] = Instruction(oc.get_opcode_by_code(op_code), instructions[i].address, [equiv])
-            i += 1
-        return instructions
\ No newline at end of file
+    def __optimize_math(instruction: Instruction) -> Instruction:
+        """
+        Replaces an instruction with constant arguments by a push of its result.
+        """
+        equiv_func = instruction.instruction.equivalent_function
+        if not equiv_func:
+            return instruction
+        equiv = equiv_func(*instruction.arguments) & (2 ** 256 - 1)
+        push_num = Parser.num_bytes(equiv)
+        return Instruction(oc.get_opcode_by_code(96 + push_num), instruction.address, [equiv])
@@ -0,0 +1,194 @@
+import unittest
+
+from ethdasm.contract import Contract
+from ethdasm.opcodes import get_opcode_by_mnemonic
+from ethdasm.parse import ControlIndex, Instruction, Parser, ParseException
+from ethdasm.render import render_disassembly
+
+
+class TestParser(unittest.TestCase):
+    def test_binary_input(self):
+        """
+        Tests that raw binary bytecode decodes the same as its hex string.
+        """
+        hex_ops = Parser.decode('6020603081910201')
+        bin_ops = Parser.decode(bytes.fromhex('6020603081910201'))
+        self.assertEqual([(o.address, o.instruction, o.arguments) for o in hex_ops],
+                         [(o.address, o.instruction, o.arguments) for o in bin_ops])
+        self.assertEqual(bin_ops[1].arguments, [0x30])
+        self.assertEqual(bin_ops[2].address, 4)
+
+    def test_truncated_push(self):
+        """
+        Tests that a PUSH without enough data becomes a THROW.
+            PUSH1 01
+            PUSH2 ??
+        """
+        ops = Parser.decode('600161ff')
+        self.assertEqual(ops[-1].instruction.name, 'THROW')
+        self.assertEqual(ops[-1].address, 2)
+
+    def test_math_fixed_point(self):
+        """
+        Tests that chained constant math folds completely:
+            CALLER
+            PUSH1 01
+            PUSH1 02
+            PUSH1 03
+            PUSH1 04
+            ADD
+            ADD
+            ADD
+        """
+        blocks = Parser.parse('336001600260036004010101')
+        instructions = blocks[0].instructions
+        self.assertEqual(len(instructions), 2)
+        self.assertTrue(instructions[1].instruction.is_push)
+        self.assertEqual(instructions[1].arguments, [10])
+
+    def test_selectors(self):
+        """
+        Tests finding both dispatcher patterns after the selector extraction:
+            PUSH1 00
+            CALLDATALOAD
+            PUSH1 e0
+            SHR
+            PUSH4 41c0e1b5
+            DUP2
+            EQ
+            PUSH2 001c
+            JUMPI
+            DUP1
+            PUSH4 f3fef3a3
+            EQ
+            PUSH2 001e
+            JUMPI
+            JUMPDEST
+            STOP
+            JUMPDEST
+            PUSH4 12345678
+            DUP2
+            EQ
+            PUSH2 001c
+            JUMPI
+        The comparison after the first function is not part of the dispatcher.
+        """
+        selectors = Parser.selectors('60003560e01c'
+                                     '6341c0e1b5811461001c5780'
+                                     '63f3fef3a31461001e57'
+                                     '5b00'
+                                     '5b6312345678811461001c57')
+        self.assertEqual(selectors, {0x41c0e1b5: 0x1c, 0xf3fef3a3: 0x1e})
+
+    def test_selectors_need_extraction(self):
+        """
+        Tests that comparisons of other values are not selectors:
+            CALLVALUE
+            DUP1
+            PUSH1 00
+            EQ
+            PUSH2 000a
+            JUMPI
+            PUSH1 00
+            CALLDATALOAD
+            PUSH1 00
+            EQ
+            PUSH2 000a
+            JUMPI
+        """
+        self.assertEqual(Parser.selectors('348060001461000a57'
+                                          '60003560001461000a57'), {})
+
+    def test_instruction_stream(self):
+        """
+        Tests that blocks are views over one compact instruction stream.
+        """
+        blocks = Parser.parse('600160025b6003')
+        self.assertEqual(len(blocks), 2)
+        self.assertIs(blocks[0].instructions.stream, blocks[1].instructions.stream)
+        self.assertEqual([i.address for i in blocks[1].instructions], [4, 5])
+        self.assertEqual(blocks[1].instructions[-1].arguments, [3])
+        blocks[1].instructions[-1].arguments = [3, 4]
+        self.assertEqual(blocks[1].instructions[-1].arguments, [3, 4])
+        self.assertEqual(blocks[0].instructions[1].arguments, [2])
+        blocks[1].add_instruction(Instruction(get_opcode_by_mnemonic('STOP'), 7, None))
+        self.assertEqual([i.address for i in blocks[1].instructions], [4, 5, 7])
+        self.assertEqual(len(blocks[0].instructions), 2)
+
+    def test_invalid_hex(self):
+        with self.assertRaises(ParseException):
+            Parser.decode('6g')
+
+    def test_segments(self):
+        """
+        Tests that creation bytecode is split into the constructor, the
+        runtime code it returns, its metadata and the constructor arguments.
+        """
+        metadata = 'a2646970667358221220' + '00' * 32 + '64736f6c6343000813' + '0033'
+        runtime = '6080604052600080fd' + metadata
+        constructor = '6080604052348015600f57600080fd5b50' + '61003e8061001f6000396000f3fe'
+        code = constructor + runtime + '00' * 32
+        segments = Parser.segments(code)
+        self.assertEqual(segments.creation, (0, 0x1f))
+        self.assertEqual(segments.runtime, (0x1f, 0x28))
+        self.assertEqual(segments.metadata, (0x28, 0x5d))
+        self.assertEqual(segments.data, (0x5d, 0x7d))
+        self.assertEqual(bytes(Parser.segment(code)).hex(), '6080604052600080fd')
+        self.assertEqual(Parser.segments(runtime), (None, (0, 9), (9, 62), None))
+        self.assertEqual(Parser.segments('6002600201'), (None, (0, 5), None, None))
+
+    def test_empty_segment(self):
+        """
+        Tests that a missing segment parses and decompiles to nothing.
+        """
+        segment = Parser.segment('6002600201', 'creation')
+        self.assertEqual(Parser.parse(segment), [])
+        contract = Contract(segment)
+        self.assertEqual(contract.parse(), [])
+        self.assertIsNone(contract.function(address=0))
+        self.assertEqual(render_disassembly(Parser.parse(segment)), '')
+
+    def test_control_index(self):
+        """
+        Tests address lookups, with a 5b byte in PUSH data that is not a
+        JUMPDEST:
+            PUSH 5b
+            JUMP
+            JUMPDEST
+            CALLER
+            STOP
+        """
+        index = ControlIndex(Parser.parse('605b565b3300'))
+        self.assertTrue(index.is_jumpdest(3))
+        self.assertFalse(index.is_jumpdest(1))
+        self.assertFalse(index.is_jumpdest(100))
+        self.assertEqual(index.block_of(4), 1)
+        self.assertEqual(index.block_at(3), 1)
+        self.assertIsNone(index.block_at(4))
+        self.assertEqual(index.instruction_at(4), 2)
+        self.assertIsNone(index.instruction_at(1))
+        # the PUSH at 0 is folded into the JUMP at 2, which starts the block
+        self.assertIsNone(index.instruction_at(0))
+        self.assertEqual(index.block_of(0), 0)
+        self.assertIsNone(index.block_of(-1))
+        self.assertIsNone(index.block_of(6))
+
+    def test_iter_blocks(self):
+        """
+        Tests that streamed blocks match parsed ones, and that a window too
+        short for a run of constants leaves some math unfolded.
+        """
+        code = '5b600160025b336004600301600a56' + '6001600260036004010101'
+        streamed = [[(i.address, i.instruction.name, i.arguments) for i in b.instructions]
+                    for b in Parser.iter_blocks(code)]
+        parsed = [[(i.address, i.instruction.name, i.arguments) for i in b.instructions]
+                  for b in Parser.parse(code)]
+        self.assertEqual(streamed, parsed)
+        self.assertEqual(streamed[0], [])
+        instructions = Parser.iter_instructions(code)
+        self.assertEqual(next(instructions).instruction.name, 'JUMPDEST')
+        narrow = list(Parser.iter_instructions('336001600260036004010101', optimize=True, window=2))
+        self.assertEqual([i.arguments for i in narrow], [None, [1], [2], [7], None, None])
+
+if __name__ == '__main__':
+    unittest.main()
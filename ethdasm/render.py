@@ -0,0 +1,100 @@
+"""
+Renders parsed contracts as text. The writers stream each block to a text
+stream as soon as it is rendered, so output never has to be held in memory.
+"""
+import io
+from typing import Dict, Iterable, TextIO
+
+from ethdasm.budget import Degradation
+from ethdasm.contract import ContractBlock
+from ethdasm.parse import Block, Segments
+
+
+def write_degradations(degradations: Iterable[Degradation], stream: TextIO, comment: str):
+    """
+    Writes what was left undone to stay within a budget, one comment per line.
+    """
+    for degradation in degradations:
+        stream.write('{} degraded: {}\n'.format(comment, degradation))
+
+
+def write_disassembly(blocks: Iterable[Block], stream: TextIO, degradations: Iterable[Degradation]=()):
+    """
+    Writes parsed blocks as simplified op-codes, after any degradations.
+    """
+    write_degradations(degradations, stream, ';')
+    for block in blocks:
+        stream.write('\n; Procedure ' + hex(block.address) + '\n')
+        for operation in block.instructions:
+            stream.write('[{0: >8}] | {1: <20} | {2}\n'.format(
+                hex(operation.address),
+                operation.instruction.name,
+                operation.arguments))
+
+
+def write_decompilation(blocks: Iterable[ContractBlock], stream: TextIO, degradations: Iterable[Degradation]=()):
+    """
+    Writes decompiled blocks as python-like pseudo-code, after any
+    degradations.
+    """
+    write_degradations(degradations, stream, '#')
+    for lines in blocks:
+        stream.write(str(lines) + '\n')
+        indentation = "\t" * lines.indentation_level
+        for line in lines.lines:
+            stream.write(indentation + str(line) + '\n')
+        stream.write('\n')
+
+
+def write_selectors(selectors: Dict[int, int], stream: TextIO):
+    """
+    Writes the selectors of the function dispatcher and their jump targets.
+    """
+    for selector, address in selectors.items():
+        stream.write('0x{0:08x} -> {1}\n'.format(selector, hex(address)))
+
+
+def write_segments(segments: Segments, stream: TextIO):
+    """
+    Writes the byte range of each segment found in the bytecode.
+    """
+    for name, bounds in segments._asdict().items():
+        if bounds is not None:
+            stream.write('{0: <8} | {1: >8} - {2: >8} | {3} bytes\n'.format(
+                name, hex(bounds[0]), hex(bounds[1]), bounds[1] - bounds[0]))
+
+
+def render_disassembly(blocks: Iterable[Block], degradations: Iterable[Degradation]=()) -> str:
+    """
+    Renders parsed blocks as simplified op-codes.
+    """
+    output = io.StringIO()
+    write_disassembly(blocks, output, degradations)
+    return output.getvalue()
+
+
+def render_decompilation(blocks: Iterable[ContractBlock], degradations: Iterable[Degradation]=()) -> str:
+    """
+    Renders decompiled blocks as python-like pseudo-code.
+    """
+    output = io.StringIO()
+    write_decompilation(blocks, output, degradations)
+    return output.getvalue()
+
+
+def render_selectors(selectors: Dict[int, int]) -> str:
+    """
+    Renders the selectors of the function dispatcher.
+    """
+    output = io.StringIO()
+    write_selectors(selectors, output)
+    return output.getvalue()
+
+
+def render_segments(segments: Segments) -> str:
+    """
+    Renders the byte ranges of the segments of the bytecode.
+    """
+    output = io.StringIO()
+    write_segments(segments, output)
+    return output.getvalue()
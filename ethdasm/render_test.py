@@ -0,0 +1,28 @@
+import io
+import unittest
+
+from ethdasm.contract import Contract
+from ethdasm.parse import Parser
+from ethdasm.render import write_decompilation, write_disassembly
+
+
+class TestRender(unittest.TestCase):
+    def test_write_disassembly(self):
+        """
+        Tests that each block is written as a procedure.
+        """
+        stream = io.StringIO()
+        write_disassembly(Parser.parse('6002600201'), stream)
+        self.assertEqual(stream.getvalue(),
+                         '\n; Procedure 0x4\n[     0x4] | PUSH2                | [4]\n')
+
+    def test_write_decompilation(self):
+        """
+        Tests that blocks are written as indented functions.
+        """
+        stream = io.StringIO()
+        write_decompilation(Contract('600160025b01').parse(), stream)
+        self.assertEqual(stream.getvalue().splitlines()[:2], ['def main():', '\tvar1 = 0x1'])
+
+if __name__ == '__main__':
+    unittest.main()
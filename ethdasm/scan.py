@@ -0,0 +1,189 @@
+"""
+Finds instruction boundaries without decoding instructions, for questions
+asked of whole corpora such as opcode histograms and JUMPDEST validity.
+Uses NumPy when it is installed and a plain loop otherwise.
+
+    python -m ethdasm.scan 'contracts/*.evm' --top 20
+"""
+import argparse
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import ethdasm.opcodes as oc
+from ethdasm.batch import iter_items, read_item
+from ethdasm.parse import Parser
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMPY = np is not None
+
+# bytes of immediate data after each opcode byte
+_WIDTHS = bytes(oc.get_opcode_by_code(code).push_width for code in range(256))
+_JUMPDEST = oc.get_opcode_by_mnemonic('JUMPDEST').code
+
+
+class Scan(NamedTuple):
+    """
+    The instruction boundaries of one contract. ``starts`` holds a 1 for
+    every byte an instruction starts at, ``histogram`` counts the opcode
+    bytes at those starts and ``jumpdests`` lists the valid jump targets.
+    """
+    starts: bytes
+    histogram: Tuple[int, ...]
+    jumpdests: List[int]
+
+
+def _scan_python(code: memoryview) -> Scan:
+    starts = bytearray(len(code))
+    histogram = [0] * 256
+    jumpdests = []
+    widths = _WIDTHS
+    address = 0
+    end = len(code)
+    while address < end:
+        opcode = code[address]
+        starts[address] = 1
+        histogram[opcode] += 1
+        if opcode == _JUMPDEST:
+            jumpdests.append(address)
+        address += 1 + widths[opcode]
+    return Scan(bytes(starts), tuple(histogram), jumpdests)
+
+
+def _starts_numpy(data, offsets, chunk: int):
+    """
+    Marks the instruction starts of contracts laid end to end in one array,
+    cut into chunks of ``chunk`` bytes. A walk through every chunk, guessing
+    that an instruction starts at its first byte, advances in lockstep
+    across all chunks. The guesses are then fixed up in order: a chunk
+    whose first true instruction starts later is walked again from there
+    until the walk meets its guessed path, which takes a few instructions.
+    """
+    total = len(data)
+    lengths = np.diff(offsets)
+    ends = np.repeat(offsets[1:], lengths)
+    # where the next instruction would start, never past the contract
+    step = np.minimum(np.arange(1, total + 1) + np.frombuffer(_WIDTHS, dtype=np.uint8)[data], ends)
+    starts = np.union1d(offsets[:-1][lengths > 0], np.arange(0, total, chunk))
+    stops = np.minimum(np.append(starts[1:], total), ends[starts])
+    exits = np.empty_like(starts)
+    guessed = np.zeros(total, dtype=bool)
+    lanes = np.arange(len(starts))
+    positions = starts
+    while len(lanes):
+        guessed[positions] = True
+        positions = step[positions]
+        walking = positions < stops[lanes]
+        exits[lanes[~walking]] = positions[~walking]
+        lanes, positions = lanes[walking], positions[walking]
+    entry = 0
+    for start, stop, exit in zip(starts.tolist(), stops.tolist(), exits.tolist()):
+        if entry != start:
+            position = entry
+            walked = []
+            while position < stop and not guessed[position]:
+                walked.append(position)
+                position = int(step[position])
+            guessed[start:min(position, stop)] = False
+            guessed[walked] = True
+            if position >= stop:
+                exit = position
+        entry = exit
+    return guessed
+
+
+def _scan_numpy(codes: List[memoryview], chunk: int=1024) -> List[Scan]:
+    """
+    Scans contracts together, with one set of array operations for all.
+    """
+    lengths = np.fromiter(map(len, codes), dtype=np.int64, count=len(codes))
+    offsets = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    data = np.frombuffer(b''.join(codes), dtype=np.uint8)
+    reached = _starts_numpy(data, offsets, chunk)
+    scans = []
+    for start, stop in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+        starts = reached[start:stop]
+        opcodes = data[start:stop][starts]
+        scans.append(Scan(starts.tobytes(), tuple(np.bincount(opcodes, minlength=256).tolist()),
+                          (np.flatnonzero(starts)[opcodes == _JUMPDEST]).tolist()))
+    return scans
+
+
+def scan(contract_code: Union[str, bytes, bytearray, memoryview], use_numpy: Optional[bool]=None) -> Scan:
+    """
+    Scans one contract, given as hex or binary bytecode.
+    """
+    return next(scan_many([contract_code], use_numpy=use_numpy))
+
+
+def scan_many(codes: Iterable[Union[str, bytes, bytearray, memoryview]], batch_bytes: int=16 * 1024 * 1024,
+              use_numpy: Optional[bool]=None) -> Iterator[Scan]:
+    """
+    Scans contracts in order. With NumPy, contracts are scanned together in
+    batches of about ``batch_bytes``. ``use_numpy`` forces either scanner;
+    by default NumPy is used if it is installed.
+    """
+    if use_numpy is None:
+        use_numpy = NUMPY
+    if use_numpy and not NUMPY:
+        raise ImportError('scanning with NumPy needs numpy installed')
+    if not use_numpy:
+        for code in codes:
+            yield _scan_python(Parser.to_bytes(code))
+        return
+    batch = []
+    size = 0
+    for code in codes:
+        code = Parser.to_bytes(code)
+        batch.append(code)
+        size += len(code)
+        if size >= batch_bytes:
+            yield from _scan_numpy(batch)
+            batch = []
+            size = 0
+    if batch:
+        yield from _scan_numpy(batch)
+
+
+def verify(contract_code: Union[str, bytes, bytearray, memoryview], result: Scan) -> bool:
+    """
+    Checks a scan against the instructions Parser.decode finds.
+    """
+    code = Parser.to_bytes(contract_code)
+    addresses = [instruction.address for instruction in Parser.decode(code)]
+    starts = bytearray(len(code))
+    histogram = [0] * 256
+    for address in addresses:
+        starts[address] = 1
+        histogram[code[address]] += 1
+    jumpdests = [address for address in addresses if code[address] == _JUMPDEST]
+    return result == (bytes(starts), tuple(histogram), jumpdests)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source', help='directory, glob pattern or JSON-lines file of contracts')
+    parser.add_argument('--top', type=int, default=256, help='number of most frequent opcodes to print')
+    parser.add_argument('--verify', action='store_true', help='checks every scan against the decoder')
+    parser.add_argument('--no-numpy', action='store_true', help='scans without NumPy')
+    args = parser.parse_args()
+    codes = [read_item(item) for item in iter_items(args.source) if item.error is None]
+    totals = [0] * 256
+    mismatches = 0
+    for code, result in zip(codes, scan_many(codes, use_numpy=False if args.no_numpy else None)):
+        totals = [total + count for total, count in zip(totals, result.histogram)]
+        if args.verify and not verify(code, result):
+            mismatches += 1
+    ranked = sorted(range(256), key=lambda opcode: -totals[opcode])[:args.top]
+    for opcode in ranked:
+        if totals[opcode]:
+            print('{0:02x} {1: <14} | {2: >10}'.format(opcode, oc.get_opcode_by_code(opcode).name, totals[opcode]))
+    if args.verify:
+        print('{} contracts, {} differ from the decoder'.format(len(codes), mismatches))
+
+
+if __name__ == '__main__':
+    main()
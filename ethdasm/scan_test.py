@@ -0,0 +1,48 @@
+import random
+import unittest
+
+from ethdasm.scan import NUMPY, scan, scan_many, verify
+
+
+class TestScan(unittest.TestCase):
+    def codes(self):
+        rnd = random.Random(0)
+        codes = [bytes(rnd.getrandbits(8) for _ in range(rnd.randrange(3000))) for _ in range(20)]
+        return codes + [b'', b'\x7f', b'\x5b', bytes.fromhex('605b565b3300')]
+
+    def test_scan(self):
+        """
+        Tests boundaries, with a 5b byte in PUSH data that is not a
+        JUMPDEST and a truncated PUSH at the end:
+            PUSH 5b
+            JUMP
+            JUMPDEST
+            CALLER
+            PUSH2 ??
+        """
+        result = scan('605b565b3361ff', use_numpy=False)
+        self.assertEqual(result.starts, bytes([1, 0, 1, 1, 1, 1, 0]))
+        self.assertEqual(result.jumpdests, [3])
+        self.assertEqual(result.histogram[0x60], 1)
+        self.assertEqual(result.histogram[0x61], 1)
+        self.assertEqual(sum(result.histogram), 5)
+
+    def test_python_against_decoder(self):
+        codes = self.codes()
+        for code, result in zip(codes, scan_many(codes, use_numpy=False)):
+            self.assertTrue(verify(code, result))
+
+    @unittest.skipUnless(NUMPY, 'numpy is not installed')
+    def test_numpy_against_decoder(self):
+        """
+        Tests the NumPy scanner on batches that cut contracts into many
+        chunks and hold several contracts each.
+        """
+        codes = self.codes() * 3
+        results = list(scan_many(codes, batch_bytes=10000, use_numpy=True))
+        self.assertEqual(len(results), len(codes))
+        for code, result in zip(codes, results):
+            self.assertTrue(verify(code, result))
+
+if __name__ == '__main__':
+    unittest.main()
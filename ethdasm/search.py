@@ -0,0 +1,367 @@
+"""
+Inverted index of opcode n-grams over a corpus of contracts, to find
+instruction sequences without parsing every contract again.
+
+    python -m ethdasm.search index corpus.idx 'contracts/*.evm'
+    python -m ethdasm.search query corpus.idx 'CALLDATALOAD ... DELEGATECALL'
+
+A pattern is a sequence of opcode names. ``...`` stands for any number of
+instructions in between, within the same block or, with ``--scope
+contract``, anywhere later in the contract.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+import ethdasm.opcodes as oc
+from ethdasm.batch import iter_items, read_item
+from ethdasm.parse import Parser
+
+VERSION = 1
+GAP = '...'
+_MAGIC = b'EDNG'
+_JUMPDEST = oc.get_opcode_by_mnemonic('JUMPDEST').code
+# opcodes with the same name, such as every undefined byte, share one code
+_CANONICAL = bytes(oc.get_opcode_by_mnemonic(oc.get_opcode_by_code(code).name).code for code in range(256))
+_WIDTHS = [1 + oc.get_opcode_by_code(code).push_width for code in range(256)]
+
+
+class Match(NamedTuple):
+    """
+    Where a pattern starts: the contract, the address of the block holding
+    the first instruction, and the address of that instruction.
+    """
+    contract: str
+    block: int
+    address: int
+
+
+class _Segment:
+    """
+    An immutable file of postings. Each n-gram, stored as the bytes of its
+    opcodes, maps to an array of (contract, block, address) triples. A
+    directory of where each array starts is kept at the end of the file,
+    so a query only reads the arrays of the n-grams it needs.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as segment:
+            self.data = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:4] != _MAGIC:
+            raise ValueError('{} is not an n-gram index segment'.format(path))
+        start = int.from_bytes(self.data[-8:], 'little')
+        self.directory = {bytes.fromhex(key): entry for key, entry in
+                          json.loads(self.data[start:len(self.data) - 8]).items()}
+
+    def postings(self, key: bytes) -> array:
+        postings = array('I')
+        entry = self.directory.get(key)
+        if entry is not None:
+            offset, count = entry
+            postings.frombytes(self.data[offset:offset + count * postings.itemsize])
+        return postings
+
+    @staticmethod
+    def write(path: str, postings: Dict[bytes, array]):
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(handle, 'wb') as segment:
+            segment.write(_MAGIC)
+            directory = {}
+            offset = len(_MAGIC)
+            for key in sorted(postings):
+                values = postings[key]
+                directory[key.hex()] = (offset, len(values))
+                segment.write(values.tobytes())
+                offset += len(values) * values.itemsize
+            segment.write(json.dumps(directory, separators=(',', ':')).encode())
+            segment.write(offset.to_bytes(8, 'little'))
+        os.replace(temp_path, path)
+
+
+class NgramIndex:
+    """
+    An index in a directory. Contracts are added in batches, each written
+    as a new segment file, so adding to the index never rewrites it;
+    ``compact`` merges the segments into one. Contracts are numbered in
+    the order they are added and bytecode that is already indexed is only
+    recorded under its new name.
+    """
+
+    def __init__(self, directory: str, n: int=3):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        meta = {'version': VERSION, 'n': n, 'contracts': 0, 'segments': []}
+        try:
+            with open(self.__path('meta.json')) as meta_file:
+                meta = json.load(meta_file)
+        except FileNotFoundError:
+            pass
+        if meta['version'] != VERSION:
+            raise ValueError('index version {} is not supported'.format(meta['version']))
+        self.n = meta['n']
+        self.names: List[List[str]] = []
+        self.hashes: Dict[str, int] = {}
+        self.__segment_names = meta['segments']
+        self.__segments = [_Segment(self.__path(name)) for name in self.__segment_names]
+        self.__pending = defaultdict(lambda: array('I'))
+        self.__added = []
+        self.__lines = 0
+        try:
+            with open(self.__path('contracts.jsonl'), 'r+') as contracts:
+                # lines past the count in meta.json are from a commit that
+                # did not finish
+                while self.__lines < meta['contracts']:
+                    self.__record(**json.loads(contracts.readline()))
+                    self.__lines += 1
+                contracts.truncate(contracts.tell())
+        except FileNotFoundError:
+            pass
+
+    def __path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def __record(self, name: str, sha256: str):
+        number = self.hashes.get(sha256)
+        if number is None:
+            self.hashes[sha256] = len(self.names)
+            self.names.append([name])
+        else:
+            self.names[number].append(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name: str, contract_code: Union[str, bytes, bytearray, memoryview]) -> bool:
+        """
+        Adds a contract, kept in memory until ``commit``. Returns False if
+        the same bytecode is already indexed, under this name or another.
+        """
+        code = Parser.to_bytes(contract_code)
+        sha256 = hashlib.sha256(code).hexdigest()
+        indexed = sha256 in self.hashes
+        if indexed and name in self.names[self.hashes[sha256]]:
+            return False
+        number = len(self.names)
+        self.__record(name, sha256)
+        self.__added.append({'name': name, 'sha256': sha256})
+        if indexed:
+            return False
+        block = 0
+        codes = bytearray()
+        addresses = []
+        for instruction in Parser.iter_instructions(code):
+            if instruction.instruction.code == _JUMPDEST:
+                self.__add_block(number, block, codes, addresses)
+                block = instruction.address
+                codes = bytearray()
+                addresses = []
+            codes.append(instruction.instruction.code)
+            addresses.append(instruction.address)
+        self.__add_block(number, block, codes, addresses)
+        return True
+
+    def __add_block(self, number: int, block: int, codes: bytearray, addresses: List[int]):
+        """
+        Posts the n-gram starting at every instruction of a block. Near the
+        end of the block the n-grams are shorter.
+        """
+        codes = bytes(codes).translate(_CANONICAL)
+        pending = self.__pending
+        n = self.n
+        for at, address in enumerate(addresses):
+            pending[codes[at:at + n]].extend((number, block, address))
+
+    def commit(self):
+        """
+        Writes the contracts added since the last commit as a new segment.
+        """
+        if not self.__added:
+            return
+        names = list(self.__segment_names)
+        if self.__pending:
+            name = self.__new_segment_name()
+            _Segment.write(self.__path(name), self.__pending)
+            names.append(name)
+            self.__segments.append(_Segment(self.__path(name)))
+        with open(self.__path('contracts.jsonl'), 'a') as contracts:
+            for added in self.__added:
+                contracts.write(json.dumps(added) + '\n')
+        self.__lines += len(self.__added)
+        self.__write_meta(names)
+        self.__pending = defaultdict(lambda: array('I'))
+        self.__added = []
+
+    def compact(self):
+        """
+        Merges every segment into one.
+        """
+        self.commit()
+        if len(self.__segments) < 2:
+            return
+        merged = defaultdict(lambda: array('I'))
+        for segment in self.__segments:
+            for key in segment.directory:
+                merged[key].extend(segment.postings(key))
+        name = self.__new_segment_name()
+        _Segment.write(self.__path(name), merged)
+        stale = self.__segment_names
+        self.__write_meta([name])
+        self.__segments = [_Segment(self.__path(name))]
+        for old in stale:
+            os.remove(self.__path(old))
+
+    def __new_segment_name(self) -> str:
+        number = max((int(name[8:14]) for name in self.__segment_names), default=0) + 1
+        return 'segment-{:06d}.idx'.format(number)
+
+    def __write_meta(self, segments: List[str]):
+        self.__segment_names = segments
+        handle, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(handle, 'w') as meta_file:
+            json.dump({'version': VERSION, 'n': self.n, 'contracts': self.__lines, 'segments': segments}, meta_file)
+        os.replace(temp_path, self.__path('meta.json'))
+
+    def __postings(self, key: bytes, prefix: bool) -> Set[Tuple[int, int, int]]:
+        """
+        The places an n-gram starts at, or with ``prefix`` any n-gram it
+        is the start of.
+        """
+        found = set()
+        for segment in self.__segments:
+            keys = [other for other in segment.directory if other.startswith(key)] if prefix else [key]
+            for other in keys:
+                values = segment.postings(other)
+                found.update(zip(values[0::3], values[1::3], values[2::3]))
+        return found
+
+    def __find(self, codes: bytes) -> List[Tuple[int, int, int, int]]:
+        """
+        Finds a run of opcodes, as (contract, block, start, end) tuples.
+        The run is cut into n-grams, and the places of each are shifted
+        back by the size of the instructions before it to line them up.
+        N-grams end at the end of a block, so a run can only match with a
+        JUMPDEST as its first opcode.
+        """
+        matches = None
+        offset = 0
+        for at in range(0, len(codes), self.n):
+            piece = codes[at:at + self.n]
+            places = self.__postings(piece, len(piece) < self.n)
+            if matches is None:
+                matches = places
+            else:
+                matches = {place for place in matches if (place[0], place[1], place[2] + offset) in places}
+            offset += sum(_WIDTHS[code] for code in piece)
+            if not matches:
+                break
+        return sorted((contract, block, start, start + offset) for contract, block, start in matches or ())
+
+    def query(self, pattern: str, scope: str='block') -> List[Match]:
+        """
+        Finds where a pattern of opcode names, with ``...`` for gaps,
+        starts. Gaps stay within a block unless ``scope`` is ``contract``.
+        Contracts indexed under several names match under each.
+        """
+        if scope not in ('block', 'contract'):
+            raise ValueError('unknown scope {!r}'.format(scope))
+        runs = []
+        for run in pattern.replace(GAP, ' {} '.format(GAP)).split(GAP):
+            names = run.split()
+            if not names:
+                continue
+            try:
+                runs.append(bytes(oc.get_opcode_by_mnemonic(name.upper()).code for name in names))
+            except KeyError as e:
+                raise ValueError('unknown opcode {}'.format(e)) from e
+        if not runs:
+            raise ValueError('empty pattern')
+        found = []
+        for run in runs:
+            places = defaultdict(list)
+            for contract, block, start, end in self.__find(run):
+                places[(contract, block if scope == 'block' else 0)].append((start, end, block))
+            found.append(places)
+        results = []
+        for key, firsts in found[0].items():
+            if not all(key in places for places in found[1:]):
+                continue
+            for start, end, block in firsts:
+                for places in found[1:]:
+                    following = places[key]
+                    at = bisect_left(following, (end,))
+                    if at == len(following):
+                        break
+                    end = following[at][1]
+                else:
+                    results.extend(Match(name, block, start) for name in self.names[key[0]])
+        results.sort(key=lambda match: (match.contract, match.address))
+        return results
+
+
+def index_items(index: NgramIndex, items: Iterable, segment: str='runtime') -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Adds batch items to an index, yielding the name of each and the error
+    if it could not be read.
+    """
+    for item in items:
+        try:
+            code = read_item(item)
+            index.add(item.name, Parser.segment(code, segment))
+        except Exception as e:
+            yield item.name, '{}: {}'.format(type(e).__name__, e)
+        else:
+            yield item.name, None
+    index.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command')
+    # the required keyword of add_subparsers needs Python 3.7
+    commands.required = True
+    index_parser = commands.add_parser('index', help='adds contracts to an index, creating it if needed')
+    index_parser.add_argument('index', help='directory of the index')
+    index_parser.add_argument('source', help='directory, glob pattern or JSON-lines file of contracts')
+    index_parser.add_argument('--n', type=int, default=3, help='length of the n-grams of a new index')
+    index_parser.add_argument('--segment', default='runtime', choices=['runtime', 'creation', 'metadata', 'data', 'all'],
+                              help='segment of the bytecode to index')
+    index_parser.add_argument('--compact', action='store_true', help='merges the segments of the index afterwards')
+    query_parser = commands.add_parser('query', help='lists where a pattern of opcodes starts')
+    query_parser.add_argument('index', help='directory of the index')
+    query_parser.add_argument('pattern', help="opcode names, with ... for any instructions in between")
+    query_parser.add_argument('--scope', default='block', choices=['block', 'contract'],
+                              help='whether gaps may cross into later blocks')
+    args = parser.parse_args()
+    if args.command == 'query' and not os.path.exists(os.path.join(args.index, 'meta.json')):
+        parser.error('no index in {}'.format(args.index))
+    index = NgramIndex(args.index, args.n if args.command == 'index' else 3)
+    if args.command == 'index':
+        before = len(index)
+        errors = 0
+        for name, error in index_items(index, iter_items(args.source), args.segment):
+            if error is not None:
+                errors += 1
+                print('{}: {}'.format(name, error), file=sys.stderr)
+        if args.compact:
+            index.compact()
+        print('{} contracts added ({} errors), {} indexed'.format(len(index) - before, errors, len(index)),
+              file=sys.stderr)
+        return
+    try:
+        matches = index.query(args.pattern, args.scope)
+    except ValueError as e:
+        parser.error(str(e))
+    for match in matches:
+        print('{0} | {1: >8} | {2: >8}'.format(match.contract, hex(match.block), hex(match.address)))
+
+
+if __name__ == '__main__':
+    main()
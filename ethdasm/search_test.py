@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+from ethdasm.search import Match, NgramIndex
+
+# PUSH1 00 CALLDATALOAD CALLER PUSH1 00 SSTORE JUMPDEST CALLER POP PUSH1 01 SSTORE STOP
+GUARDED = '60003533600055' + '5b3350600155' + '00'
+# JUMPDEST CALLER PUSH1 00 SSTORE
+UNGUARDED = '5b33600055'
+
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'index')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_query(self):
+        """
+        Tests runs of opcodes longer and shorter than the n-grams, and gaps
+        within a block and across blocks.
+        """
+        index = NgramIndex(self.path, n=2)
+        index.add('guarded', GUARDED)
+        index.add('unguarded', UNGUARDED)
+        index.commit()
+        self.assertEqual(index.query('CALLER PUSH1 SSTORE'),
+                         [Match('guarded', 0, 3), Match('unguarded', 0, 1)])
+        self.assertEqual(index.query('JUMPDEST CALLER'), [Match('guarded', 7, 7), Match('unguarded', 0, 0)])
+        self.assertEqual(index.query('calldataload ... sstore'), [Match('guarded', 0, 2)])
+        self.assertEqual(index.query('CALLDATALOAD ... POP ... STOP'), [])
+        self.assertEqual(index.query('CALLDATALOAD ... POP ... STOP', scope='contract'), [Match('guarded', 0, 2)])
+        with self.assertRaises(ValueError):
+            index.query('CALLER ... FOO')
+
+    def test_incremental(self):
+        """
+        Tests that contracts added later are found after reopening the
+        index, that known bytecode is recorded under its new name only, and
+        that compacting keeps every posting.
+        """
+        index = NgramIndex(self.path, n=3)
+        self.assertTrue(index.add('guarded', GUARDED))
+        index.commit()
+        index = NgramIndex(self.path)
+        self.assertTrue(index.add('unguarded', UNGUARDED))
+        self.assertFalse(index.add('copy', bytes.fromhex(GUARDED)))
+        self.assertFalse(index.add('copy', GUARDED))
+        index.commit()
+        index = NgramIndex(self.path)
+        self.assertEqual(len(index), 2)
+        expected = [Match('copy', 0, 3), Match('guarded', 0, 3), Match('unguarded', 0, 1)]
+        self.assertEqual(index.query('CALLER PUSH1 SSTORE'), expected)
+        index.compact()
+        self.assertEqual(len([name for name in os.listdir(self.path) if name.endswith('.idx')]), 1)
+        self.assertEqual(NgramIndex(self.path).query('CALLER PUSH1 SSTORE'), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,372 @@
+"""
+Versioned binary format for parsed blocks and decompiled functions, so
+later analyses reload them instead of parsing again.
+
+A file starts with a header and a table of sections. Values of 256 bits
+are stored once each in a constant pool of 32-byte entries; everything
+else is fixed-width records and columns that refer into the pool, the
+table of outputs or the table of strings.
+
+    save('contract.ir', blocks=Parser.parse(code), lines=Contract(code).parse())
+    ir = load('contract.ir')
+    write_decompilation(ir.lines, sys.stdout)
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Sequence
+from typing import Dict, List, Optional, Tuple, Union
+
+import ethdasm.opcodes as oc
+from ethdasm.contract import ContractBlock, DisassemblyLine, InstructionLine, JumpLine, Output
+from ethdasm.parse import Block, InstructionRange, InstructionStream
+
+VERSION = 2
+_MAGIC = b'EDIR'
+_HEADER = struct.Struct('<4sHH')
+_SECTION = struct.Struct('<QQ')
+_SECTIONS = ('pool', 'opcodes', 'addresses', 'arg_starts', 'arg_counts', 'arguments', 'blocks',
+             'strings', 'outputs', 'lines', 'references', 'functions')
+_CONSTANT = 32
+# kind, used, value: a pool index for constants, the number otherwise
+_OUTPUT = struct.Struct('<BBxxI')
+# kind, opcode, address, assigned and argument ranges of the references,
+# target and condition
+_LINE = struct.Struct('<BBxxiIIIiii')
+# name, args_needed, indentation_level, range of lines, range of returns
+_FUNCTION = struct.Struct('<IIIIIII')
+_BLOCK = struct.Struct('<III')
+
+_INSTRUCTION_LINE = 0
+_JUMP_TO_NAME = 1
+_JUMP_TO_OUTPUT = 2
+# added in version 2, for blocks disassembled to stay within a budget
+_DISASSEMBLY_LINE = 3
+
+
+class FormatError(ValueError):
+    pass
+
+
+def _column(typecode: str, data) -> array:
+    # columns are stored little-endian
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder == 'big' and column.itemsize > 1:
+        column.byteswap()
+    return column
+
+
+def _column_bytes(column: array) -> bytes:
+    if sys.byteorder == 'big' and column.itemsize > 1:
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+class _Writer:
+    """
+    Interns constants, strings and outputs while records are built.
+    """
+
+    def __init__(self):
+        self.pool = {}
+        self.strings = {}
+        self.outputs = {}
+        self.output_records = bytearray()
+
+    def constant(self, value) -> int:
+        value = getattr(value, 'value', value)
+        index = self.pool.get(value)
+        if index is None:
+            index = self.pool[value] = len(self.pool)
+        return index
+
+    def string(self, value: str) -> int:
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def output(self, output: Output) -> int:
+        index = self.outputs.get(id(output))
+        if index is None:
+            index = self.outputs[id(output)] = (len(self.outputs), output)
+            value = self.constant(output.value) if output.kind == Output.CONSTANT else output.value
+            self.output_records += _OUTPUT.pack(output.kind, output.used, value)
+        return index[0]
+
+    def blocks(self, blocks: List[Block], sections: Dict[str, bytes]):
+        opcodes = array('B')
+        addresses = array('I')
+        arg_starts = array('I')
+        arg_counts = array('b')
+        arguments = array('I')
+        records = bytearray()
+        for block in blocks:
+            start = len(opcodes)
+            instructions = block.instructions
+            if isinstance(instructions, InstructionRange):
+                stream = instructions.stream
+                opcodes.extend(stream.opcodes[instructions.start:instructions.stop])
+                addresses.extend(stream.addresses[instructions.start:instructions.stop])
+                operations = (stream.get_arguments(index) for index in range(instructions.start, instructions.stop))
+            else:
+                opcodes.extend(operation.instruction.code for operation in instructions)
+                addresses.extend(operation.address for operation in instructions)
+                operations = (operation.arguments for operation in instructions)
+            for operation_arguments in operations:
+                arg_starts.append(len(arguments))
+                if operation_arguments is None:
+                    arg_counts.append(-1)
+                else:
+                    arg_counts.append(len(operation_arguments))
+                    arguments.extend(map(self.constant, operation_arguments))
+            records += _BLOCK.pack(block.address, start, len(opcodes))
+        sections.update(opcodes=_column_bytes(opcodes), addresses=_column_bytes(addresses),
+                        arg_starts=_column_bytes(arg_starts), arg_counts=_column_bytes(arg_counts),
+                        arguments=_column_bytes(arguments), blocks=bytes(records))
+
+    def functions(self, functions: List[ContractBlock], sections: Dict[str, bytes]):
+        lines = bytearray()
+        references = array('I')
+        records = bytearray()
+        line_count = 0
+        def refer(outputs: Optional[List[Output]]) -> Tuple[int, int]:
+            start = len(references)
+            if outputs is None:
+                return start, -1
+            references.extend(map(self.output, outputs))
+            return start, len(outputs)
+        for function in functions:
+            first_line = line_count
+            for line in function.lines:
+                if isinstance(line, InstructionLine):
+                    assigned, assigned_count = refer(line.assign_to)
+                    args, args_count = refer(line.args)
+                    lines += _LINE.pack(_INSTRUCTION_LINE, line.instruction.code, line.address, assigned,
+                                        assigned_count, args, args_count, -1, -1)
+                elif isinstance(line, JumpLine):
+                    args, args_count = refer(line.args)
+                    if isinstance(line.jump_to, Output):
+                        kind, target = _JUMP_TO_OUTPUT, self.output(line.jump_to)
+                    else:
+                        kind, target = _JUMP_TO_NAME, self.string(line.jump_to)
+                    condition = -1 if line.jump_condition is None else self.output(line.jump_condition)
+                    lines += _LINE.pack(kind, 0, line.address, args, 0, args, args_count, target, condition)
+                elif isinstance(line, DisassemblyLine):
+                    args, args_count = refer(line.args)
+                    lines += _LINE.pack(_DISASSEMBLY_LINE, line.instruction.code, line.address, args, 0,
+                                        args, args_count, -1, -1)
+                else:
+                    raise TypeError('cannot serialize a {}'.format(type(line).__name__))
+                line_count += 1
+            returns, returns_count = refer(function.return_vals)
+            records += _FUNCTION.pack(self.string(function.name), function.args_needed, function.indentation_level,
+                                      first_line, line_count - first_line, returns, returns_count)
+        sections.update(lines=bytes(lines), references=_column_bytes(references), functions=bytes(records),
+                        outputs=bytes(self.output_records))
+
+
+def dumps(blocks: Optional[List[Block]]=None, lines: Optional[List[ContractBlock]]=None) -> bytes:
+    """
+    Serializes parsed blocks, decompiled functions or both.
+    """
+    writer = _Writer()
+    sections = dict.fromkeys(_SECTIONS, b'')
+    if blocks is not None:
+        writer.blocks(blocks, sections)
+    if lines is not None:
+        writer.functions(lines, sections)
+    sections['strings'] = json.dumps(list(writer.strings)).encode() if writer.strings else b''
+    sections['pool'] = b''.join(value.to_bytes(_CONSTANT, 'big') for value in writer.pool)
+    flags = (blocks is not None) | (lines is not None) << 1
+    data = bytearray(_HEADER.pack(_MAGIC, VERSION, flags))
+    offset = len(data) + _SECTION.size * len(_SECTIONS)
+    table = bytearray()
+    for name in _SECTIONS:
+        # every section starts on an 8-byte boundary
+        offset += -offset % 8
+        table += _SECTION.pack(offset, len(sections[name]))
+        offset += len(sections[name])
+    data += table
+    for name in _SECTIONS:
+        data += bytes(-len(data) % 8)
+        data += sections[name]
+    return bytes(data)
+
+
+def save(path: str, blocks: Optional[List[Block]]=None, lines: Optional[List[ContractBlock]]=None):
+    """
+    Writes parsed blocks, decompiled functions or both to a file.
+    """
+    data = dumps(blocks, lines)
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    with os.fdopen(handle, 'wb') as ir_file:
+        ir_file.write(data)
+    os.replace(temp_path, path)
+
+
+class Functions(Sequence):
+    """
+    Decompiled functions read from a buffer, each built on first access.
+    Outputs are shared between the functions as they were when saved.
+    """
+
+    def __init__(self, ir: 'IR'):
+        self.ir = ir
+        self.__functions = [None] * (len(ir.section('functions')) // _FUNCTION.size)
+
+    def __len__(self):
+        return len(self.__functions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        function = self.__functions[index]
+        if function is None:
+            function = self.__functions[index] = self.ir.function(index)
+        return function
+
+
+class IR:
+    """
+    Parsed blocks and decompiled functions read back from a buffer, such as
+    a memory-mapped file. Nothing is decoded until it is used.
+    """
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview, mmap.mmap]):
+        self.buffer = memoryview(buffer)
+        if len(self.buffer) < _HEADER.size:
+            raise FormatError('truncated header')
+        magic, version, self.flags = _HEADER.unpack_from(self.buffer)
+        if magic != _MAGIC:
+            raise FormatError('not an ethdasm IR file')
+        if not 1 <= version <= VERSION:
+            raise FormatError('IR format version {} is not supported'.format(version))
+        self.__sections = {}
+        for number, name in enumerate(_SECTIONS):
+            offset, length = _SECTION.unpack_from(self.buffer, _HEADER.size + number * _SECTION.size)
+            if offset + length > len(self.buffer):
+                raise FormatError('section {} is truncated'.format(name))
+            self.__sections[name] = (offset, length)
+        self.__pool = None
+        self.__strings = None
+        self.__outputs = None
+        self.__references_column = None
+        self.__blocks = None
+        self.__functions = None
+
+    def section(self, name: str) -> memoryview:
+        offset, length = self.__sections[name]
+        return self.buffer[offset:offset + length]
+
+    def constant(self, index: int) -> int:
+        if self.__pool is None:
+            self.__pool = {}
+        value = self.__pool.get(index)
+        if value is None:
+            offset = self.__sections['pool'][0] + index * _CONSTANT
+            value = self.__pool[index] = int.from_bytes(self.buffer[offset:offset + _CONSTANT], 'big')
+        return value
+
+    @property
+    def blocks(self) -> Optional[List[Block]]:
+        """
+        The parsed blocks, as ranges of one InstructionStream filled
+        straight from the columns of the file.
+        """
+        if not self.flags & 1:
+            return None
+        if self.__blocks is None:
+            stream = InstructionStream()
+            stream.opcodes = _column('B', self.section('opcodes'))
+            stream.addresses = _column('I', self.section('addresses'))
+            stream.arg_starts = _column('I', self.section('arg_starts'))
+            stream.arg_counts = _column('b', self.section('arg_counts'))
+            stream.values = [self.constant(index) for index in _column('I', self.section('arguments'))]
+            self.__blocks = [Block(address, InstructionRange(stream, start, stop))
+                             for address, start, stop in _BLOCK.iter_unpack(self.section('blocks'))]
+        return self.__blocks
+
+    @property
+    def lines(self) -> Optional[Functions]:
+        """
+        The decompiled functions.
+        """
+        if not self.flags & 2:
+            return None
+        if self.__functions is None:
+            self.__functions = Functions(self)
+        return self.__functions
+
+    def __output(self, index: int) -> Output:
+        if self.__outputs is None:
+            self.__outputs = [None] * (self.__sections['outputs'][1] // _OUTPUT.size)
+        output = self.__outputs[index]
+        if output is None:
+            kind, used, value = _OUTPUT.unpack_from(self.buffer, self.__sections['outputs'][0] + index * _OUTPUT.size)
+            if kind == Output.CONSTANT:
+                # constants are interned, so only ever mark them used
+                output = Output.constant(self.constant(value))
+                output.used = output.used or bool(used)
+            else:
+                output = Output(value, variable=kind == Output.VARIABLE, arg=kind == Output.ARG)
+                output.used = bool(used)
+            self.__outputs[index] = output
+        return output
+
+    def __string(self, index: int) -> str:
+        if self.__strings is None:
+            self.__strings = json.loads(bytes(self.section('strings')))
+        return self.__strings[index]
+
+    def __references(self, start: int, count: int) -> Optional[List[Output]]:
+        if count < 0:
+            return None
+        if self.__references_column is None:
+            self.__references_column = _column('I', self.section('references'))
+        return [self.__output(index) for index in self.__references_column[start:start + count]]
+
+    def function(self, index: int) -> ContractBlock:
+        """
+        Builds the decompiled function at a position, sharing the outputs
+        built for others.
+        """
+        name, args_needed, indentation, first_line, line_count, returns, returns_count = \
+            _FUNCTION.unpack_from(self.section('functions'), index * _FUNCTION.size)
+        function = ContractBlock(self.__string(name))
+        function.args_needed = args_needed
+        function.indentation_level = indentation
+        function.return_vals = self.__references(returns, returns_count)
+        lines = self.section('lines')[first_line * _LINE.size:(first_line + line_count) * _LINE.size]
+        for kind, code, address, assigned, assigned_count, args, args_count, target, condition in \
+                _LINE.iter_unpack(lines):
+            if kind == _INSTRUCTION_LINE:
+                function.add_line(InstructionLine(address, self.__references(assigned, assigned_count),
+                                                  oc.get_opcode_by_code(code), self.__references(args, args_count)))
+                continue
+            if kind == _DISASSEMBLY_LINE:
+                function.add_line(DisassemblyLine(address, oc.get_opcode_by_code(code),
+                                                  self.__references(args, args_count)))
+                continue
+            jump_to = self.__output(target) if kind == _JUMP_TO_OUTPUT else self.__string(target)
+            function.add_line(JumpLine(address, jump_to, self.__output(condition) if condition >= 0 else None,
+                                       self.__references(args, args_count)))
+        return function
+
+
+def loads(buffer: Union[bytes, bytearray, memoryview, mmap.mmap]) -> IR:
+    return IR(buffer)
+
+
+def load(path: str) -> IR:
+    """
+    Memory-maps a file written by save.
+    """
+    with open(path, 'rb') as ir_file:
+        return IR(mmap.mmap(ir_file.fileno(), 0, access=mmap.ACCESS_READ))
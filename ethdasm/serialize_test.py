@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from ethdasm.contract import Contract
+from ethdasm.parse import Parser
+from ethdasm.render import render_decompilation, render_disassembly
+from ethdasm.serialize import FormatError, dumps, load, loads, save
+
+# PUSH32 ff..ff CALLER SSTORE PUSH1 0b JUMP JUMPDEST CALLVALUE PUSH1 0 SLOAD ADD PUSH1 0 SSTORE
+CODE = '7f' + 'ff' * 32 + '3355600b565b3460005401600055'
+
+
+class TestSerialize(unittest.TestCase):
+    def test_round_trip(self):
+        """
+        Tests that both levels render the same after a round trip, and that
+        saving what was loaded gives the same bytes.
+        """
+        blocks = Parser.parse(CODE)
+        lines = Contract(CODE).parse()
+        data = dumps(blocks, lines)
+        ir = loads(data)
+        self.assertEqual(render_disassembly(ir.blocks), render_disassembly(blocks))
+        self.assertEqual(render_decompilation(ir.lines), render_decompilation(lines))
+        self.assertEqual(ir.blocks[0].instructions[0].arguments, [2 ** 256 - 1])
+        self.assertEqual(dumps(ir.blocks, list(ir.lines)), data)
+
+    def test_shared_outputs(self):
+        """
+        Tests that an output used by several lines is loaded as one object.
+        """
+        lines = Contract('33600052600051800133').parse()
+        ir = loads(dumps(lines=lines))
+        self.assertIsNone(ir.blocks)
+        loaded = ir.lines[0].lines
+        self.assertEqual(str(loaded[3]), 'var3 = var2 + var2')
+        self.assertIs(loaded[3].args[0], loaded[2].assign_to[0])
+        self.assertIs(loaded[3].args[1], loaded[2].assign_to[0])
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'contract.ir')
+            save(path, blocks=Parser.parse(CODE))
+            ir = load(path)
+            self.assertEqual(render_disassembly(ir.blocks), render_disassembly(Parser.parse(CODE)))
+            self.assertIsNone(ir.lines)
+
+    def test_format_errors(self):
+        data = dumps(Parser.parse(CODE))
+        with self.assertRaises(FormatError):
+            loads(b'EDNG' + data[4:])
+        with self.assertRaises(FormatError):
+            loads(data[:4] + b'\x63\x00' + data[6:])
+        with self.assertRaises(FormatError):
+            loads(data[:-8])
+
+if __name__ == '__main__':
+    unittest.main()
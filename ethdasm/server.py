@@ -0,0 +1,210 @@
+"""
+Serves analyses from warm worker processes over a local socket, so callers
+do not pay interpreter startup and imports for every contract.
+
+Requests and responses are JSON objects, one per line. A request holds
+``bytecode`` as hex and optionally ``mode`` (``disassemble``, ``decompile``
+or ``selectors``), ``segment`` and an ``id`` that is echoed back. Responses
+to the requests of one connection are written in order.
+
+    python -m ethdasm.server /tmp/ethdasm.sock --workers 4
+    python -m ethdasm.server 127.0.0.1:8545
+
+The server has no authentication, so TCP addresses are limited to the
+loopback interface unless ``public`` is set.
+"""
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Dict, Optional, Tuple, Union
+
+from ethdasm.batch import BatchItem, analyze
+from ethdasm.budget import Budget, add_budget_arguments, budget_from_args
+from ethdasm.client import parse_address
+
+MODES = ('disassemble', 'decompile', 'selectors')
+# longest request line accepted, bytecode included
+LINE_LIMIT = 64 * 1024 * 1024
+
+
+def is_loopback(host: str) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def handle(request: Dict[str, Any], cache_dir: Optional[str]=None,
+           cache_size: int=256 * 1024 * 1024, budget: Optional[Budget]=None) -> Dict[str, Any]:
+    """
+    Runs one request in a worker process, within the limits of ``budget``.
+    """
+    mode = request.get('mode', 'disassemble')
+    if mode not in MODES:
+        return {'output': None, 'error': 'ValueError: unknown mode {!r}'.format(mode)}
+    start = time.perf_counter()
+    result = analyze(BatchItem(request.get('name', '-'), None, request['bytecode']),
+                     decompile=mode == 'decompile', selectors=mode == 'selectors',
+                     segment=request.get('segment', 'runtime'), cache_dir=cache_dir, cache_size=cache_size,
+                     budget=budget)
+    return {'output': result.output, 'error': result.error, 'cached': result.cached,
+            'degraded': result.degraded, 'seconds': time.perf_counter() - start}
+
+
+class AnalysisServer:
+    """
+    Accepts requests from any number of connections into a bounded queue,
+    from which one consumer per worker process feeds the pool. Reading
+    from a connection waits while the queue is full.
+    """
+
+    def __init__(self, workers: Optional[int]=None, queue_size: int=64, cache_dir: Optional[str]=None,
+                 cache_size: int=256 * 1024 * 1024, budget: Optional[Budget]=None, public: bool=False):
+        self.workers = workers or os.cpu_count() or 1
+        self.public = public
+        self.queue_size = queue_size
+        self.handler = partial(handle, cache_dir=cache_dir, cache_size=cache_size, budget=budget)
+        self.executor = None
+        self.server = None
+        self.queue = None
+        self.consumers = []
+
+    async def start(self, address: Union[str, Tuple[str, int]]):
+        if isinstance(address, tuple) and not self.public and not is_loopback(address[0]):
+            raise ValueError('{} is not a loopback address; listening on it needs public'.format(address[0]))
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        # forks the workers before anything listens, so they start with the
+        # analysis imported and inherit no sockets
+        await asyncio.get_event_loop().run_in_executor(self.executor, os.getpid)
+        self.queue = asyncio.Queue(self.queue_size)
+        self.consumers = [asyncio.ensure_future(self.__consume()) for _ in range(self.workers)]
+        if isinstance(address, tuple):
+            self.server = await asyncio.start_server(self.__connection, *address, limit=LINE_LIMIT)
+        else:
+            self.server = await asyncio.start_unix_server(self.__connection, address, limit=LINE_LIMIT)
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for consumer in self.consumers:
+            consumer.cancel()
+        await asyncio.gather(*self.consumers, return_exceptions=True)
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    async def __consume(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            request, future = await self.queue.get()
+            try:
+                response = await loop.run_in_executor(self.executor, self.handler, request)
+            except Exception as e:
+                response = {'output': None, 'error': '{}: {}'.format(type(e).__name__, e)}
+            if not future.cancelled():
+                future.set_result(response)
+            self.queue.task_done()
+
+    @staticmethod
+    def __parse(line: bytes) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Returns the request on a line, or the response to a malformed one.
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict) or not isinstance(request.get('bytecode'), str):
+                raise ValueError('request needs a hex "bytecode" string')
+        except ValueError as e:
+            return None, {'output': None, 'error': '{}: {}'.format(type(e).__name__, e)}
+        return request, None
+
+    async def __connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_event_loop()
+        pending = asyncio.Queue()
+        async def respond():
+            while True:
+                item = await pending.get()
+                if item is None:
+                    return
+                request, future = item
+                response = await future
+                if request is not None and 'id' in request:
+                    response['id'] = request['id']
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        responder = asyncio.ensure_future(respond())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                request, error = self.__parse(line)
+                future = loop.create_future()
+                if error is not None:
+                    future.set_result(error)
+                else:
+                    # waits for room in the queue before reading on
+                    await self.queue.put((request, future))
+                await pending.put((request, future))
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            await pending.put(None)
+            try:
+                await responder
+            except ConnectionError:
+                pass
+            writer.close()
+
+
+async def serve(address: Union[str, Tuple[str, int]], **options):
+    server = AnalysisServer(**options)
+    await server.start(address)
+    stop = asyncio.get_event_loop().create_future()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_event_loop().add_signal_handler(sig, stop.set_result, None)
+    try:
+        await stop
+    finally:
+        await server.close()
+        if not isinstance(address, tuple) and os.path.exists(address):
+            os.remove(address)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('address', help='path of a Unix socket, or host:port to listen on TCP')
+    parser.add_argument('--workers', type=int, help='number of worker processes')
+    parser.add_argument('--queue', type=int, default=64, help='requests waiting for a worker before reading pauses')
+    parser.add_argument('--cache', type=str, help='caches results in this directory, keyed by bytecode hash')
+    parser.add_argument('--cache-size', type=int, default=256, help='maximum size of the cache in megabytes')
+    parser.add_argument('--public', action='store_true',
+                        help='allows listening on TCP addresses other than loopback; the server has no authentication')
+    add_budget_arguments(parser)
+    args = parser.parse_args()
+    address = parse_address(args.address)
+    if isinstance(address, tuple) and not args.public and not is_loopback(address[0]):
+        parser.error('{} is not a loopback address, pass --public to listen on it'.format(address[0]))
+    # a loop of our own, as asyncio.run needs Python 3.7
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(serve(address, workers=args.workers, queue_size=args.queue,
+                                      cache_dir=args.cache, cache_size=args.cache_size * 1024 * 1024,
+                                      budget=budget_from_args(args), public=args.public))
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from ethdasm.client import parse_address
+from ethdasm.server import AnalysisServer, is_loopback
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.directory = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.directory.name, 'ethdasm.sock')
+        self.server = AnalysisServer(workers=1, queue_size=2)
+        self.loop.run_until_complete(self.server.start(self.address))
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.server.close())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self.directory.cleanup()
+
+    def exchange(self, *requests):
+        return self.loop.run_until_complete(self.__exchange(*requests))
+
+    async def __exchange(self, *requests):
+        reader, writer = await asyncio.open_unix_connection(self.address)
+        for request in requests:
+            writer.write((request if isinstance(request, str) else json.dumps(request)).encode() + b'\n')
+        writer.write_eof()
+        responses = [json.loads(line) for line in (await reader.read()).splitlines()]
+        writer.close()
+        return responses
+
+    def test_requests(self):
+        """
+        Tests that responses come back in order with their ids, more
+        requests than the queue holds included.
+        """
+        responses = self.exchange(*({'bytecode': '6002600201', 'id': i} for i in range(5)),
+                                        {'bytecode': '6002600201', 'mode': 'decompile', 'id': 'd'})
+        self.assertEqual([r['id'] for r in responses], [0, 1, 2, 3, 4, 'd'])
+        self.assertIn('PUSH', responses[0]['output'])
+        self.assertIsNone(responses[0]['error'])
+        self.assertNotEqual(responses[0]['output'], responses[-1]['output'])
+
+    def test_errors(self):
+        """
+        Tests that bad requests get an error and leave the connection open.
+        """
+        responses = self.exchange('not json', {'code': '00'}, {'bytecode': '6g', 'id': 1},
+                                        {'bytecode': '00', 'mode': 'fly'}, {'bytecode': '00'})
+        self.assertEqual(len(responses), 5)
+        self.assertIn('JSONDecodeError', responses[0]['error'])
+        self.assertIn('bytecode', responses[1]['error'])
+        self.assertIn('ParseException', responses[2]['error'])
+        self.assertEqual(responses[2]['id'], 1)
+        self.assertIn('mode', responses[3]['error'])
+        self.assertIsNone(responses[4]['error'])
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address('8545'), ('127.0.0.1', 8545))
+        self.assertEqual(parse_address('localhost:8545'), ('localhost', 8545))
+        self.assertEqual(parse_address('/tmp/ethdasm.sock'), '/tmp/ethdasm.sock')
+
+    def test_public_address(self):
+        """
+        Tests that only loopback TCP addresses are served without public.
+        """
+        self.assertTrue(is_loopback('127.0.0.1'))
+        self.assertTrue(is_loopback('::1'))
+        self.assertTrue(is_loopback('localhost'))
+        self.assertFalse(is_loopback('0.0.0.0'))
+        self.assertFalse(is_loopback('example.com'))
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(AnalysisServer(workers=1).start(('0.0.0.0', 0)))
+
+if __name__ == '__main__':
+    unittest.main()
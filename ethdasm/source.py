@@ -0,0 +1,88 @@
+"""
+Reads contract bytecode from files and STDIN, as hex or raw binary.
+"""
+import binascii
+import mmap
+import sys
+from typing import IO, Union
+
+from ethdasm.parse import ParseException
+
+# hex digits and the whitespace allowed around and between them
+_HEX_DIGITS = frozenset(b'0123456789abcdefABCDEF')
+_WHITESPACE = frozenset(b' \t\n\r\f\v')
+# printable ASCII, which binary bytecode practically never starts with
+_TEXT = frozenset(range(0x20, 0x7f)) | _WHITESPACE
+# number of leading bytes looked at to tell hex from binary
+_SNIFF_BYTES = 64
+
+
+def read_code(path: str) -> memoryview:
+    """
+    Reads the bytecode of a file, or of STDIN if the path is ``-``. Files
+    are memory-mapped; binary bytecode is returned without copying.
+    """
+    if path == '-':
+        return read_stream(sys.stdin.buffer)
+    with open(path, 'rb') as contract:
+        return read_stream(contract)
+
+
+def read_stream(stream: IO[bytes]) -> memoryview:
+    """
+    Reads the bytecode of a binary stream. Regular files are memory-mapped,
+    pipes are read in full.
+    """
+    try:
+        buffer = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # pipes and terminals can not be mapped, and neither can empty files
+        buffer = stream.read()
+    return load_code(buffer)
+
+
+def load_code(buffer: Union[bytes, bytearray, memoryview, mmap.mmap]) -> memoryview:
+    """
+    Converts the contents of a bytecode file to raw bytecode. The contents
+    are hex if, after surrounding whitespace and an optional 0x prefix,
+    they start with text; they are binary if they start with any other
+    byte. Text that is not hex raises a ParseException.
+    """
+    view = memoryview(buffer)
+    start, end = _strip(view)
+    if view[start:start + 2] in (b'0x', b'0X'):
+        start += 2
+    elif not _is_text(view[start:start + _SNIFF_BYTES]):
+        return view
+    return _decode_hex(view[start:end])
+
+
+def _strip(view: memoryview):
+    start, end = 0, len(view)
+    while start < end and view[start] in _WHITESPACE:
+        start += 1
+    while end > start and view[end - 1] in _WHITESPACE:
+        end -= 1
+    return start, end
+
+
+def _is_text(view: memoryview) -> bool:
+    return len(view) > 0 and all(byte in _TEXT for byte in view)
+
+
+def _decode_hex(view: memoryview) -> memoryview:
+    """
+    Decodes hex in one pass straight from the buffer. Hex wrapped over
+    several lines is decoded from a copy with the whitespace skipped.
+    """
+    try:
+        return memoryview(binascii.unhexlify(view))
+    except (binascii.Error, ValueError):
+        pass
+    try:
+        return memoryview(bytes.fromhex(str(view, 'ascii')))
+    except (UnicodeDecodeError, ValueError) as e:
+        for offset, byte in enumerate(view):
+            if byte not in _HEX_DIGITS and byte not in _WHITESPACE:
+                raise ParseException('Invalid hex contract code: {!r} at offset {}.'.format(chr(byte), offset)) from e
+        raise ParseException('Invalid hex contract code.') from e
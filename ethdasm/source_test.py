@@ -0,0 +1,72 @@
+import io
+import os
+import tempfile
+import unittest
+
+from ethdasm.parse import ParseException, Parser
+from ethdasm.source import load_code, read_code, read_stream
+
+
+class TestSource(unittest.TestCase):
+    def read_file(self, contents: bytes) -> bytes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'contract')
+            with open(path, 'wb') as contract:
+                contract.write(contents)
+            return bytes(read_code(path))
+
+    def test_hex_file(self):
+        """
+        Tests that hex files are decoded with or without a 0x prefix, in
+        either case and wrapped over several lines.
+        """
+        self.assertEqual(self.read_file(b'0x6002600201\n'), b'\x60\x02\x60\x02\x01')
+        self.assertEqual(self.read_file(b'  6002600201'), b'\x60\x02\x60\x02\x01')
+        self.assertEqual(self.read_file(b'60AB\n60cd\r\n01\n'), b'\x60\xab\x60\xcd\x01')
+
+    def test_binary_file(self):
+        """
+        Tests that binary files are read as they are.
+        """
+        code = bytes.fromhex('6080604052600436106049576000357c0100')
+        self.assertEqual(self.read_file(code), code)
+        self.assertEqual(self.read_file(b''), b'')
+
+    def test_zero_copy(self):
+        """
+        Tests that binary bytecode is used without copying.
+        """
+        code = bytearray.fromhex('6002600201')
+        view = load_code(code)
+        code[1] = 3
+        self.assertEqual(view[1], 3)
+
+    def test_stream(self):
+        """
+        Tests reading from a stream that can not be memory-mapped, like a
+        pipe on STDIN.
+        """
+        stream = io.BytesIO(b'0x6002600201\n')
+        self.assertEqual(Parser.parse(read_stream(stream))[0].instructions[0].arguments, [4])
+
+    def test_invalid_hex(self):
+        """
+        Tests that broken hex raises a ParseException rather than being
+        taken as binary.
+        """
+        with self.assertRaises(ParseException):
+            load_code(b'0x600')
+        with self.assertRaises(ParseException):
+            load_code(b'60' * 64 + b'zz')
+
+    def test_hex_typo(self):
+        """
+        Tests that a typo near the start of a hex file is reported instead
+        of the file being taken as binary.
+        """
+        with self.assertRaisesRegex(ParseException, "'x' at offset 7"):
+            load_code(b'6002600x01')
+
+
+if __name__ == '__main__':
+    unittest.main()
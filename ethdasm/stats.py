@@ -0,0 +1,69 @@
+"""
+Collects per-phase timings and counters while parsing and decompiling.
+"""
+import json
+import time
+from typing import Dict, Optional
+
+
+class Phase:
+    """
+    Times one run of a phase and collects its counters. Counters and times
+    are added to the phase's totals in the stats when the run ends.
+    """
+
+    def __init__(self, stats: Optional['Stats'], name: str):
+        self.stats = stats
+        self.name = name
+        self.counters = {}
+        self.start = 0.0
+
+    def __enter__(self) -> Dict[str, int]:
+        if self.stats is not None:
+            self.start = time.perf_counter()
+        return self.counters
+
+    def __exit__(self, *exc):
+        if self.stats is not None:
+            self.stats.add(self.name, time.perf_counter() - self.start, self.counters)
+        return False
+
+
+class Stats:
+    """
+    Totals of wall time, runs and counters for each phase, in the order the
+    phases first ran.
+    """
+
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, name: str, seconds: float, counters: Dict[str, int], calls: int=1):
+        phase = self.phases.setdefault(name, {'calls': 0, 'seconds': 0.0})
+        phase['calls'] += calls
+        phase['seconds'] += seconds
+        for counter, value in counters.items():
+            phase[counter] = phase.get(counter, 0) + value
+
+    def merge(self, phases: Dict[str, Dict[str, float]]):
+        """
+        Adds the totals of another set of phases, e.g. from a worker process.
+        """
+        for name, phase in phases.items():
+            counters = {key: value for key, value in phase.items() if key not in ('calls', 'seconds')}
+            self.add(name, phase['seconds'], counters, phase['calls'])
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        return {name: dict(phase) for name, phase in self.phases.items()}
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), indent=2)
+
+    def __str__(self):
+        lines = ['{0: <22} | {1: >6} | {2: >10} | {3}'.format('phase', 'calls', 'seconds', 'counters')]
+        for name, phase in self.phases.items():
+            counters = ', '.join('{}={}'.format(key, value) for key, value in phase.items()
+                                 if key not in ('calls', 'seconds'))
+            lines.append('{0: <22} | {1: >6} | {2: >10.4f} | {3}'.format(name, phase['calls'], phase['seconds'], counters))
+        return '\n'.join(lines)
+
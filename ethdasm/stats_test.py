@@ -0,0 +1,32 @@
+import unittest
+
+from ethdasm.contract import Contract
+from ethdasm.stats import Stats
+
+
+class TestStats(unittest.TestCase):
+    def test_phases(self):
+        """
+        Tests that parsing and decompiling record every phase.
+        """
+        stats = Stats()
+        Contract('600260035b6002015b600402', stats=stats).parse()
+        phases = stats.as_dict()
+        self.assertEqual(phases['decode']['instructions'], 8)
+        self.assertEqual(phases['parse_blocks']['blocks'], 3)
+        self.assertIn('simplify', phases)
+        self.assertGreaterEqual(phases['translate']['seconds'], 0)
+
+    def test_merge(self):
+        """
+        Tests adding up the stats of several contracts.
+        """
+        first, second = Stats(), Stats()
+        Contract('6002600201', stats=first).parse()
+        Contract('6002600201', stats=second).parse()
+        first.merge(second.as_dict())
+        self.assertEqual(first.as_dict()['decode']['calls'], 2)
+        self.assertEqual(first.as_dict()['decode']['instructions'], 6)
+
+if __name__ == '__main__':
+    unittest.main()